@@ -0,0 +1,310 @@
+"""Convert the JSON outputs of many repositories to CSV in one run."""
+
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr, redirect_stdout
+import glob
+from io import StringIO
+import os
+import sys
+import time
+import traceback
+import csv_driver
+from src import file_io_utils as io
+
+# error of a conversion whose worker process died while running it alone
+WORKER_DIED = "Worker process died, e.g. killed for running out of memory"
+
+
+def main():
+    """
+    Driver method for converting many configurations on one process pool.
+
+    Every configuration is converted as by csv_driver.py, but all of them
+    share one pool of worker processes, so interpreter startup is paid
+    once per worker rather than once per repository. Conversions are
+    scheduled largest input first so that the longest ones do not start
+    last and leave the other workers idle at the end of the run.
+
+    A failed conversion is reported and the remaining ones carry on, even
+    if it took its worker process down with it; see run_batch. The exit
+    status is 1 if any conversion failed.
+    """
+    cli_args = get_cli_args()
+    cfg_paths: list = expand_cfg_paths(cli_args.cfg_files)
+
+    if not cfg_paths:
+        print("\nNo configuration files found!")
+        sys.exit(1)
+
+    workers: int = cli_args.workers or os.cpu_count() or 1
+    jobs = sorted(
+        ((get_input_size(path), path) for path in cfg_paths), reverse=True
+    )
+
+    start = time.perf_counter()
+    results: list = run_batch(jobs, workers)
+
+    print_report(results, time.perf_counter() - start, workers)
+
+    if any(error is not None for *_, error in results):
+        sys.exit(1)
+
+
+def get_cli_args() -> argparse.Namespace:
+    """
+    Get initializing arguments from CLI.
+
+    Returns:
+        argparse.Namespace: paths or glob patterns of configuration files
+        and the size of the process pool
+    """
+    arg_parser = argparse.ArgumentParser(
+        description="JSON → CSV for many repositories",
+    )
+
+    arg_parser.add_argument(
+        "cfg_files",
+        nargs="+",
+        help="Paths or glob patterns of JSON configuration files",
+    )
+
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes shared by all conversions. Defaults to"
+        " the number of CPUs",
+    )
+
+    return arg_parser.parse_args()
+
+
+def expand_cfg_paths(patterns: list) -> list:
+    """
+    Expand glob patterns into configuration paths.
+
+    Args:
+        patterns (list): paths or glob patterns of configuration files
+
+    Returns:
+        list: unique matching paths, in the order first given. Patterns
+        without matches are kept as given so that they are reported as
+        failed conversions.
+    """
+    cfg_paths: list = []
+
+    for pattern in patterns:
+        cfg_paths += sorted(glob.glob(pattern)) or [pattern]
+
+    return list(dict.fromkeys(cfg_paths))
+
+
+def get_input_size(cfg_path: str) -> int:
+    """
+    Get the size of the input JSON of a configuration, used as its cost.
+
+    Args:
+        cfg_path (str): path to a configuration file
+
+    Returns:
+        int: size of the input in bytes, or 0 if it cannot be determined.
+        Such configurations fail early once they are run.
+    """
+    try:
+        with redirect_stdout(StringIO()):
+            cfg: dict = io.read_jsonfile_into_dict(cfg_path)
+
+        return os.path.getsize(cfg["input_json"])
+
+    except (Exception, SystemExit):
+        return 0
+
+
+def run_batch(jobs: list, workers: int) -> list:
+    """
+    Run conversions on a process pool, replacing the pool if it breaks.
+
+    A worker process that dies, e.g. killed for running out of memory,
+    breaks the whole pool and fails every conversion in flight on it. Those
+    conversions are rerun one at a time on a pool of their own, so that
+    only the ones that take down their worker again are reported as failed,
+    and the remaining conversions carry on on a new pool.
+
+    Args:
+        jobs (list): (input size, config path) of each conversion, in the
+            order to start them
+        workers (int): size of the process pool
+
+    Returns:
+        list: (config path, input size, seconds, error) of each conversion
+    """
+    results: list = []
+    queue: deque = deque(jobs)
+
+    while queue:
+        suspects: list = run_pool(queue, workers, results, len(jobs))
+
+        for size, path, _ in suspects:
+            # rerun alone, so that a broken pool can only be its doing
+            for _, _, elapsed in run_pool(
+                deque([(size, path)]), 1, results, len(jobs)
+            ):
+                add_result(
+                    results, len(jobs), (path, size, elapsed, WORKER_DIED)
+                )
+
+    return results
+
+
+def run_pool(queue: deque, workers: int, results: list, total: int) -> list:
+    """
+    Run queued conversions on a new process pool until it is done or broken.
+
+    At most one conversion per worker is submitted at a time, so that a
+    broken pool only fails the conversions that were running on it.
+
+    Args:
+        queue (deque): (input size, config path) of each conversion to run.
+            Conversions are popped as they are submitted.
+        workers (int): size of the process pool
+        results (list): results that finished conversions are added to;
+            see add_result
+        total (int): number of conversions in the batch
+
+    Returns:
+        list: (input size, config path, seconds) of each conversion that
+        was in flight when the pool broke. Empty if it never broke.
+    """
+    in_flight: dict = {}
+    broken: list = []
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while (queue or in_flight) and not broken:
+            while queue and len(in_flight) < workers:
+                size, path = queue.popleft()
+                future = pool.submit(run_conversion, path)
+                in_flight[future] = (size, path, time.perf_counter())
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                size, path, start = in_flight.pop(future)
+
+                try:
+                    elapsed, error = future.result()
+
+                except BrokenProcessPool:
+                    broken.append((size, path, time.perf_counter() - start))
+                    continue
+
+                # e.g. the result could not be sent back from the worker
+                except Exception:
+                    elapsed = time.perf_counter() - start
+                    error = traceback.format_exc(limit=-1, chain=False)
+
+                add_result(results, total, (path, size, elapsed, error))
+
+    # the conversions still in flight failed along with the pool
+    return broken + [
+        (size, path, time.perf_counter() - start)
+        for size, path, start in in_flight.values()
+    ]
+
+
+def add_result(results: list, total: int, result: tuple) -> None:
+    """
+    Add the result of a conversion and print the progress of the batch.
+
+    Args:
+        results (list): results of the batch so far
+        total (int): number of conversions in the batch
+        result (tuple): (config path, input size, seconds, error)
+
+    Returns: None
+    """
+    results.append(result)
+    path, _, elapsed, error = result
+
+    status = "ok" if error is None else "FAILED"
+    print(
+        f"[{len(results)}/{total}] {status} {path} ({elapsed:.1f}s)",
+        file=sys.stderr,
+    )
+
+
+def run_conversion(cfg_path: str) -> tuple:
+    """
+    Convert one configuration in a worker process.
+
+    The conversion runs single-process within its worker, since the pool
+    is already shared across configurations. Its console output is
+    captured so that the progress of concurrent conversions does not
+    interleave.
+
+    Args:
+        cfg_path (str): path to a configuration file
+
+    Returns:
+        tuple: seconds taken, and None on success or the error and the
+        end of the conversion's output on failure
+    """
+    output = StringIO()
+    start = time.perf_counter()
+
+    try:
+        with redirect_stdout(output), redirect_stderr(output):
+            cfg: dict = io.read_jsonfile_into_dict(cfg_path)
+            cfg["workers"] = 1
+            csv_driver.convert(cfg)
+
+    # the io utilities hard exit on missing files
+    except (Exception, SystemExit):
+        error = traceback.format_exc(limit=-1, chain=False).strip()
+        log = output.getvalue().strip()
+
+        if log:
+            error = f"{log[-1000:]}\n{error}"
+
+        return time.perf_counter() - start, error
+
+    return time.perf_counter() - start, None
+
+
+def print_report(results: list, wall_time: float, workers: int) -> None:
+    """
+    Print the time taken by each conversion and by the whole batch.
+
+    Args:
+        results (list): (config path, input size, seconds, error) of each
+            conversion
+        wall_time (float): seconds taken by the whole batch
+        workers (int): size of the process pool
+
+        Returns: None
+    """
+    work_time = sum(elapsed for _, _, elapsed, _ in results)
+    failed = [result for result in results if result[3] is not None]
+
+    print(f"\n{'seconds':>10}  {'input MB':>10}  status  config")
+
+    for path, size, elapsed, error in sorted(
+        results, key=lambda result: result[2], reverse=True
+    ):
+        status = "ok" if error is None else "failed"
+        print(f"{elapsed:>10.1f}  {size / 1e6:>10.1f}  {status:<6}  {path}")
+
+    print(
+        f"\n{len(results) - len(failed)} of {len(results)} conversions"
+        f" succeeded in {wall_time:.1f}s on {workers} workers"
+        f" ({work_time:.1f}s of work, {work_time / wall_time:.2f}x"
+        " speedup)"
+    )
+
+    for path, _, _, error in failed:
+        print(f'\nConversion of "{path}" failed:\n{error}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Benchmark the stages of csv_driver.py on synthetic extractor output."""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import csv_driver
+from src import file_io_utils as io
+from src import sinks
+from src import synthetic
+
+# output types whose rows are benchmarked
+BENCH_OUTPUT_TYPES = ("merged_closed_pulls", "merged_closed_commits")
+
+# default allowed slowdown or memory growth against the baseline
+DEFAULT_THRESHOLD = 0.1
+
+
+def main():
+    """
+    Driver method for generating synthetic input and benchmarking.
+
+    "gen" writes a synthetic extractor JSON file. "run" generates an input
+    in a temporary directory and times parsing, row assembly, and CSV
+    writing for each output type in BENCH_OUTPUT_TYPES. Each benchmark
+    reports its best time out of several runs, its throughput, and its
+    peak traced memory, measured in a separate run since tracing slows
+    the code down.
+
+    Given a baseline from an earlier "run --save-baseline", benchmarks that
+    are slower or use more memory than the threshold allows are flagged,
+    and the exit status is 1.
+    """
+    cli_args = get_cli_args()
+    gen_kwargs = {
+        "seed": cli_args.seed,
+        "num_comments": cli_args.comments,
+        "num_commits": cli_args.commits,
+        "patch_lines": cli_args.patch_lines,
+    }
+
+    if cli_args.command == "gen":
+        synthetic.write_synthetic_jsonfile(
+            cli_args.out_path, cli_args.issues, **gen_kwargs
+        )
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        in_path = os.path.join(tmp_dir, "input.json")
+        synthetic.write_synthetic_jsonfile(
+            in_path, cli_args.issues, **gen_kwargs
+        )
+
+        results = run_benchmarks(in_path, tmp_dir, cli_args.repeat)
+
+    results = {
+        "params": {"issues": cli_args.issues, **gen_kwargs},
+        "benchmarks": results,
+    }
+
+    if cli_args.save_baseline:
+        io.write_dict_to_jsonfile(results, cli_args.save_baseline)
+
+    baseline = None
+
+    if cli_args.baseline:
+        baseline = io.read_jsonfile_into_dict(cli_args.baseline)
+
+        if baseline["params"] != results["params"]:
+            print("\nBaseline was run with other parameters!")
+            sys.exit(1)
+
+    regressions = print_results(
+        results["benchmarks"],
+        baseline and baseline["benchmarks"],
+        cli_args.threshold,
+    )
+
+    if regressions:
+        sys.exit(1)
+
+
+def get_cli_args() -> argparse.Namespace:
+    """
+    Get initializing arguments from CLI.
+
+    Returns:
+        argparse.Namespace: command and its options
+    """
+    arg_parser = argparse.ArgumentParser(
+        description="Benchmarks of JSON → CSV",
+    )
+
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    gen_parser = commands.add_parser(
+        "gen", help="Write a synthetic extractor JSON file"
+    )
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+
+    gen_parser.add_argument("out_path", help="Path to write the JSON to")
+
+    for parser in (gen_parser, run_parser):
+        parser.add_argument(
+            "--issues", type=int, default=20_000, help="Number of issues"
+        )
+        parser.add_argument(
+            "--comments",
+            type=int,
+            default=3,
+            help="Maximum number of comments per issue",
+        )
+        parser.add_argument(
+            "--commits",
+            type=int,
+            default=3,
+            help="Maximum number of commits per PR",
+        )
+        parser.add_argument(
+            "--patch-lines",
+            type=int,
+            default=40,
+            help="Maximum number of lines per patch",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed of the generator"
+        )
+
+    run_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timed runs of each benchmark",
+    )
+    run_parser.add_argument(
+        "--baseline", help="Path to results to compare against"
+    )
+    run_parser.add_argument(
+        "--save-baseline", help="Path to save the results to"
+    )
+    run_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed relative slowdown or memory growth",
+    )
+
+    return arg_parser.parse_args()
+
+
+def run_benchmarks(in_path: str, tmp_dir: str, repeat: int) -> dict:
+    """
+    Run every benchmark on a generated input.
+
+    Args:
+        in_path (str): path to the input JSON
+        tmp_dir (str): directory to write outputs to
+        repeat (int): number of timed runs of each benchmark
+
+    Returns:
+        dict: {benchmark name: results}; see time_benchmark
+    """
+    issues = list(io.iter_jsonfile_items(in_path))
+    in_size = os.path.getsize(in_path)
+
+    results = {
+        "parse": time_benchmark(
+            lambda: sum(1 for _ in io.iter_jsonfile_items(in_path)),
+            repeat,
+            in_size,
+        )
+    }
+
+    for output_type in BENCH_OUTPUT_TYPES:
+        columns = csv_driver.get_output_cols(output_type)
+        rows = list(csv_driver.build_rows(issues, columns, "=||="))
+        out_path = os.path.join(tmp_dir, f"{output_type}.csv")
+
+        results[f"rows/{output_type}"] = time_benchmark(
+            lambda columns=columns: len(
+                list(csv_driver.build_rows(issues, columns, "=||="))
+            ),
+            repeat,
+        )
+
+        results[f"write/{output_type}"] = time_benchmark(
+            lambda columns=columns, rows=rows, out_path=out_path: write_csv(
+                out_path, columns, rows
+            ),
+            repeat,
+        )
+
+    return results
+
+
+def write_csv(out_path: str, columns: list, rows: list) -> int:
+    """
+    Write rows to a CSV in chunks, as csv_driver.py does.
+
+    Args:
+        out_path (str): path to the output CSV
+        columns (list): column names of the output
+        rows (list): rows to write
+
+    Returns:
+        int: number of rows written
+    """
+    cfg = {"delimiter": ","}
+    sink = sinks.CSVSink(out_path, columns, cfg)
+
+    for start in range(0, len(rows), csv_driver.DEFAULT_CHUNK_SIZE):
+        chunk = rows[start : start + csv_driver.DEFAULT_CHUNK_SIZE]
+        sink.write(sinks.CSVSink.encode(chunk, columns, cfg))
+
+    sink.close()
+
+    return len(rows)
+
+
+def time_benchmark(func, repeat: int, num_bytes: int = 0) -> dict:
+    """
+    Time a benchmark and measure its peak memory.
+
+    Args:
+        func (Callable[[], int]): benchmark that returns the number of
+            items it processed
+        repeat (int): number of timed runs
+        num_bytes (int): size of the data processed, if meaningful
+
+    Returns:
+        dict: best time in seconds, items and megabytes per second, and
+        peak traced memory in bytes
+    """
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "seconds": round(best, 6),
+        "items": count,
+        "items_per_second": round(count / best, 1),
+        "peak_memory_bytes": peak_memory,
+    }
+
+    if num_bytes:
+        result["mb_per_second"] = round(num_bytes / 1e6 / best, 2)
+
+    return result
+
+
+def print_results(results: dict, baseline, threshold: float) -> list:
+    """
+    Print benchmark results, compared against a baseline if given.
+
+    Args:
+        results (dict): {benchmark name: results}
+        baseline (dict | None): results of an earlier run
+        threshold (float): allowed relative slowdown or memory growth
+
+    Returns:
+        list: names of the benchmarks that regressed
+    """
+    regressions: list = []
+
+    print(
+        f"{'benchmark':<32}{'items/s':>14}{'peak MB':>10}"
+        f"{'vs baseline':>14}"
+    )
+
+    for name, result in results.items():
+        line = (
+            f"{name:<32}{result['items_per_second']:>14,.0f}"
+            f"{result['peak_memory_bytes'] / 1e6:>10.1f}"
+        )
+
+        old = (baseline or {}).get(name)
+
+        if old is not None:
+            speed = result["items_per_second"] / old["items_per_second"]
+            memory = result["peak_memory_bytes"] / max(
+                old["peak_memory_bytes"], 1
+            )
+
+            line += f"{speed:>13.2f}x"
+
+            if speed < 1 - threshold or memory > 1 + threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+
+        print(line)
+
+    return regressions
+
+
+if __name__ == "__main__":
+    main()
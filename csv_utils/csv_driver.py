@@ -1,15 +1,27 @@
 """Convert JSON files to CSV."""
 
-# TODO:
-# 1. Can we create a validation stage that makes sure that certain items exist,
-#    ensuring certainty of proper CSV creation
-#    - would have to be per row
-#
-# 2.
-
 import argparse
-import csv
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+import itertools
+import os
+import sys
+import time
+from typing import Iterable, Iterator
 from src import file_io_utils as io
+from src import filters
+from src import incremental
+from src import profiling
+from src import sinks
+from src import validation
+
+# number of issues, or of rows in explode mode, buffered before each write
+# to the outputs
+DEFAULT_CHUNK_SIZE = 1000
+
+# values of cfg["explode"]; see compile_exploded_row_plan
+EXPLODE_MODES = ("commits", "files")
 
 
 def main():
@@ -21,39 +33,194 @@ def main():
            longer than 1, the list is surrounded by quotes.
            This behavior was in the old extractor too.
     """
-    cfg: dict = get_user_cfg()
-    input_issues_data: dict = io.read_jsonfile_into_dict(cfg["input_json"])
-    columns = get_output_cols(cfg["output_type"])
-    rows = []
+    convert(get_user_cfg())
+
+
+def convert(cfg: dict) -> None:
+    """
+    Run the conversion described by a configuration.
+
+    Args:
+        cfg (dict): user configuration
+
+    Returns: None
+    """
+    targets: list = get_output_targets(cfg)
+    columns_list = [get_output_cols(t["output_type"]) for t in targets]
+    profiler = None
+
+    if cfg.get("profile", False):
+        profiler = profiling.ExportProfiler(
+            targets[0]["output_csv"], cfg.get("cprofile", False)
+        )
+
+    # incremental exports hash the text of each issue; see src/incremental.py
+    input_issues = get_input_issues(cfg, cfg.get("incremental", False))
+
+    if profiler is not None:
+        input_issues = profiler.time_iter("read", input_issues)
+
+    report = None
+
+    if cfg.get("validate", False):
+        # invalid issues are left out of the outputs and quarantined
+        report = validation.ValidationReport(
+            cfg.get(
+                "quarantine_path",
+                targets[0]["output_csv"] + ".quarantine.jsonl",
+            ),
+            [target["output_csv"] for target in targets],
+        )
+
+    if cfg.get("incremental", False):
+        export_incremental(cfg, input_issues, targets, columns_list, report)
+
+    else:
+        export(cfg, input_issues, targets, columns_list, report, profiler)
+
+    if report is not None:
+        report.close()
+
+    if profiler is not None:
+        profiler.finish(cfg)
+
+
+def export(
+    cfg: dict,
+    input_issues: Iterable[tuple],
+    targets: list,
+    columns_list: list,
+    report=None,
+    profiler=None,
+) -> None:
+    """
+    Export issues to every output.
+
+        cfg (dict): user configuration
+        input_issues (Iterable[tuple]): (issue number, issue data) pairs
+        targets (list): dicts with "output_type" and "output_csv" keys
+        columns_list (list): column names of each output
+        report (ValidationReport | None): report of invalid issues. Issues
+            are not validated if None.
+        profiler (ExportProfiler | None): profiler to record the timings
+            of each stage in
+
+        Returns: None
+    """
+    # each output's format is chosen by the extension of its path
+    sink_types = [sinks.get_sink_type(t["output_csv"]) for t in targets]
+
+    # every issue is read once and fanned out to all outputs. Rows are built
+    # lazily and written one chunk at a time, so no output ever sits in
+    # memory as a whole
+    if cfg.get("workers", 1) > 1:
+        chunks = build_chunks_parallel(
+            cfg, input_issues, columns_list, sink_types
+        )
+
+    else:
+        chunks = build_chunks(cfg, input_issues, columns_list, sink_types)
+
+    write_chunks(
+        cfg, targets, columns_list, sink_types, chunks, report, profiler
+    )
+
+
+def get_input_issues(cfg: dict, with_text: bool = False) -> Iterable[tuple]:
+    """
+    Get the issues to export from the input JSON.
+
+    Issues are decoded before cfg["filters"] are applied; see
+    src/filters.py. Decoding with the json module's C scanner costs less
+    than skipping over rejected issues would in Python.
+
+    Args:
+        cfg (dict): user configuration
+        with_text (bool): whether to also yield the JSON text of each issue
+
+    Returns:
+        Iterable[tuple]: (issue number, issue data) pairs in input order, or
+        (issue number, issue data, issue text) if with_text is set
+    """
+    key_filter, field_filter = filters.compile_filters(cfg.get("filters", {}))
 
-    rows.append(columns)
+    if cfg.get("issue_nums"):
+        # parse only the requested issues, using a byte-offset index of the
+        # input that is built on first use
+        read_indexed = (
+            io.iter_indexed_jsonfile_members
+            if with_text
+            else io.iter_indexed_jsonfile_items
+        )
+        input_issues = read_indexed(
+            cfg["input_json"], [str(num) for num in cfg["issue_nums"]]
+        )
+
+    else:
+        # stream issues out of the input so that memory use is bounded by
+        # the largest single issue rather than by the size of the whole
+        # input file
+        read_stream = (
+            io.iter_jsonfile_members if with_text else io.iter_jsonfile_items
+        )
+        input_issues = read_stream(cfg["input_json"])
 
-    for num, data in input_issues_data.items():
-        row_data = collect_row_data(num, data, cfg["separator"])
-        ordered_row_data = [row_data[key] for key in columns]
-        rows.append(ordered_row_data)
+    if key_filter is not None or field_filter is not None:
+        input_issues = filters.filter_items(
+            input_issues, key_filter, field_filter
+        )
 
-    write_rows(cfg, rows)
+    return input_issues
 
 
 def get_user_cfg() -> dict:
     """
     Get path to and read from configuration file.
 
+    Options given on the command line override those in the file.
+
     :return: dict of configuration values
     :rtype: dict
     """
-    cfg_path = get_cli_args()
+    cli_args = get_cli_args()
+
+    cfg: dict = io.read_jsonfile_into_dict(cli_args.extractor_cfg_file)
+
+    if cli_args.workers is not None:
+        cfg["workers"] = cli_args.workers
+
+    if cli_args.profile or cli_args.cprofile:
+        cfg["profile"] = True
+        cfg["cprofile"] = cli_args.cprofile
+
+    if cli_args.explode is not None:
+        cfg["explode"] = cli_args.explode
+
+    if cli_args.issues is not None:
+        cfg["issue_nums"] = cli_args.issues
 
-    return io.read_jsonfile_into_dict(cfg_path)
+    cli_filters = {
+        "issue_num": cli_args.issue_range,
+        "is_pr": cli_args.is_pr,
+        "state": cli_args.state,
+        "created_at": cli_args.created,
+        "closed_at": cli_args.closed,
+    }
+
+    for name, arg in cli_filters.items():
+        if arg is not None:
+            cfg.setdefault("filters", {})[name] = arg
+
+    return cfg
 
 
-def get_cli_args() -> str:
+def get_cli_args() -> argparse.Namespace:
     """
     Get initializing arguments from CLI.
 
     Returns:
-        str: path to file with arguments to program
+        argparse.Namespace: path to file with arguments to program and
+        optional overrides of configuration values
     """
     # establish positional argument capability
     arg_parser = argparse.ArgumentParser(
@@ -66,7 +233,122 @@ def get_cli_args() -> str:
         help="Path to JSON configuration file",
     )
 
-    return arg_parser.parse_args().extractor_cfg_file
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes used to build and encode rows",
+    )
+
+    arg_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write a JSON report of the time used by each stage and of"
+        " peak memory next to the output",
+    )
+
+    arg_parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="Like --profile, and also dump cProfile statistics",
+    )
+
+    arg_parser.add_argument(
+        "--explode",
+        choices=EXPLODE_MODES,
+        help="Write one row per commit, or per changed file of each commit",
+    )
+
+    arg_parser.add_argument(
+        "--issues",
+        nargs="+",
+        help="Numbers of the only issues to export",
+    )
+
+    # filters; see src/filters.py. Either end of a range may be given as
+    # "none" to leave it open
+    arg_parser.add_argument(
+        "--issue-range",
+        nargs=2,
+        type=_parse_optional_int,
+        metavar=("FIRST", "LAST"),
+        help="Only export issues numbered FIRST to LAST, inclusive",
+    )
+
+    arg_parser.add_argument(
+        "--is-pr",
+        type=_parse_bool,
+        metavar="{true,false}",
+        help="Only export PRs, or only issues that are not PRs",
+    )
+
+    arg_parser.add_argument(
+        "--state",
+        nargs="+",
+        help="Only export issues in one of the given states",
+    )
+
+    arg_parser.add_argument(
+        "--created",
+        nargs=2,
+        type=_parse_optional_str,
+        metavar=("START", "END"),
+        help="Only export issues created in [START, END), as ISO 8601 dates",
+    )
+
+    arg_parser.add_argument(
+        "--closed",
+        nargs=2,
+        type=_parse_optional_str,
+        metavar=("START", "END"),
+        help="Only export issues closed in [START, END), as ISO 8601 dates",
+    )
+
+    return arg_parser.parse_args()
+
+
+def _parse_bool(arg: str) -> bool:
+    if arg.lower() not in ("true", "false"):
+        raise argparse.ArgumentTypeError(
+            f'expected "true" or "false", got "{arg}"'
+        )
+
+    return arg.lower() == "true"
+
+
+def _parse_optional_str(arg: str):
+    return None if arg.lower() == "none" else arg
+
+
+def _parse_optional_int(arg: str):
+    return None if arg.lower() == "none" else int(arg)
+
+
+def get_output_targets(cfg: dict) -> list:
+    """
+    Get the outputs to create from the user configuration.
+
+    Multiple outputs are given as a list of objects in cfg["outputs"], e.g.
+
+        "outputs": [
+            {"output_type": "merged_closed_pulls", "output_csv": "a.csv"},
+            {"output_type": "merged_closed_commits", "output_csv": "b.csv"}
+        ]
+
+    Otherwise, the single output in cfg["output_type"] and cfg["output_csv"]
+    is used.
+
+    Args:
+        cfg (dict): user configuration
+
+    Returns:
+        list: dicts with "output_type" and "output_csv" keys
+    """
+    if "outputs" in cfg:
+        return cfg["outputs"]
+
+    return [
+        {"output_type": cfg["output_type"], "output_csv": cfg["output_csv"]}
+    ]
 
 
 def get_output_cols(output_type: str) -> list:
@@ -148,39 +430,429 @@ def get_output_cols(output_type: str) -> list:
     return cols[output_type]
 
 
-def collect_row_data(issue_num: str, issue_data, separator: str) -> dict:
+def build_rows(
+    input_issues: Iterable[tuple],
+    columns: list,
+    separator: str,
+    explode=None,
+) -> Iterator[list]:
     """
-    Create a dictionary of column names to repo data.
+    Lazily create ordered CSV rows from issue data.
 
-    Note:
-        commit info all comes from the last commit right now
+    Args:
+        input_issues (Iterable[tuple]): (issue number, issue data) pairs
+        columns (list): column names to order each row by
+        separator (str): user-given separator for joining content into strings
+        explode (str | None): one of EXPLODE_MODES to build a row per
+            commit or per changed file; see compile_exploded_row_plan
+
+    Returns:
+        Iterator[list]: one list of column values per issue, or per commit
+        or file of each issue if explode is given
+    """
+    if explode is None:
+        build_row = compile_row_plan(columns)
+
+        for num, data in input_issues:
+            yield build_row(num, data, separator)
+
+        return
+
+    build_issue_rows = compile_exploded_row_plan(columns, explode)
+
+    for num, data in input_issues:
+        yield from build_issue_rows(num, data, separator)
+
+
+def build_validated_rows(
+    input_issues: Iterable[tuple],
+    columns_list: list,
+    separator: str,
+    validate,
+    explode=None,
+) -> tuple:
+    """
+    Create ordered CSV rows of each output, leaving out issues that are
+    invalid for it.
+
+    Issues that are valid for every output are built once with the union
+    of all outputs' columns, as by encode_shard. The rest are built with
+    the columns of each output they are valid for, since the fields read
+    by the other outputs may be missing.
 
     Args:
-        issue_num (str): number of current issue
-        issue_data (dict): data points of current issue
+        input_issues (Iterable[tuple]): (issue number, issue data) pairs
+        columns_list (list): column names of each output
         separator (str): user-given separator for joining content into strings
+        validate (Callable[[dict], list]): validator of every output; see
+            validation.compile_output_validators
+        explode (str | None): see build_rows
 
     Returns:
-        dict: {column name: corresponding repo data point}
+        tuple: the rows of each output, the number of rows built, and
+        (issue number, errors, issue data) of each issue that is invalid
+        for any output
+    """
+    all_columns = list(dict.fromkeys(itertools.chain(*columns_list)))
+    build_issue_rows = compile_issue_plan(all_columns, explode)
+    out_plans = [
+        compile_issue_plan(columns, explode) for columns in columns_list
+    ]
+    projections = [
+        None
+        if columns == all_columns
+        else [all_columns.index(col) for col in columns]
+        for columns in columns_list
+    ]
+
+    out_rows: list = [[] for _ in columns_list]
+    num_rows = 0
+    invalid: list = []
 
+    for num, data in input_issues:
+        out_errors = validate(data)
+
+        if not any(out_errors):
+            issue_rows = build_issue_rows(num, data, separator)
+            num_rows += len(issue_rows)
+
+            for rows, indices in zip(out_rows, projections):
+                if indices is None:
+                    rows += issue_rows
+
+                else:
+                    rows += [[row[i] for i in indices] for row in issue_rows]
+
+            continue
+
+        invalid.append((num, out_errors, data))
+        num_issue_rows = 0
+
+        for rows, build_out_rows, errors in zip(
+            out_rows, out_plans, out_errors
+        ):
+            if not errors:
+                issue_rows = build_out_rows(num, data, separator)
+                num_issue_rows = max(num_issue_rows, len(issue_rows))
+                rows += issue_rows
+
+        num_rows += num_issue_rows
+
+    return out_rows, num_rows, invalid
+
+
+def iter_chunks(
+    items: Iterable, chunk_size: int, weight=None
+) -> Iterator[list]:
     """
-    issue_col_tbl: dict = collect_issue_data(issue_num, issue_data, separator)
+    Split an iterable into lists of at most chunk_size items.
 
-    issue_col_tbl = collect_pr_data(issue_col_tbl, issue_data)
+    Args:
+        items (Iterable): items to split
+        chunk_size (int): maximum number of items, or total weight of the
+            items, per chunk
+        weight (Callable[[Any], int] | None): weight of each item. A chunk
+            ends once its items weigh chunk_size or more, so an item that
+            weighs more than chunk_size is a chunk of its own.
 
-    return issue_col_tbl
+    Returns:
+        Iterator[list]: consecutive chunks of items
+    """
+    items = iter(items)
+
+    if weight is None:
+        while chunk := list(itertools.islice(items, chunk_size)):
+            yield chunk
+
+        return
+
+    chunk: list = []
+    chunk_weight = 0
+
+    for item in items:
+        chunk.append(item)
+        chunk_weight += weight(item)
+
+        if chunk_weight >= chunk_size:
+            yield chunk
+            chunk = []
+            chunk_weight = 0
+
+    if chunk:
+        yield chunk
+
+
+def get_chunk_weight(cfg: dict):
+    """
+    Get the weight of an issue when splitting issues into chunks.
+
+    In explode mode, an issue is weighed by the number of rows it is
+    exploded into, so that chunks hold about cfg["chunk_size"] rows no
+    matter how many commits or files each PR has.
+
+    Args:
+        cfg (dict): user configuration
+
+    Returns:
+        Callable[[tuple], int] | None: weight of an (issue number, issue
+        data) pair, or None to count issues
+    """
+    explode = cfg.get("explode")
+
+    if explode is None:
+        return None
 
+    return lambda item: count_exploded_rows(item[1], explode)
 
-def collect_issue_data(
-    issue_num: str, issue_data: dict, separator: str
-) -> dict:
+
+def count_exploded_rows(issue_data: dict, explode: str) -> int:
     """
-    Collect issue data for the current issue.
+    Estimate the number of rows an issue is exploded into.
+
+    Args:
+        issue_data (dict): current issue data
+        explode (str): one of EXPLODE_MODES
+
+    Returns:
+        int: number of rows, counting incomplete commits as well
+    """
+    commits = issue_data.get("commits")
+
+    if issue_data.get("is_pr") is not True or not commits:
+        return 1
+
+    if explode == "commits":
+        return len(commits)
+
+    return sum(
+        len((commit.get("files") or {}).get("file_list") or ()) or 1
+        for commit in commits.values()
+    )
+
+
+def encode_shard(
+    shard: list, columns_list: list, sink_types: list, cfg: dict
+) -> tuple:
+    """
+    Build and encode the rows of one shard of issues for every output.
+
+    Each issue is built once with the union of all outputs' columns, then
+    projected onto the columns of each output and encoded by its sink. If
+    cfg["validate"] is set, an issue is only left out of the outputs whose
+    columns read its invalid fields; see build_validated_rows.
+
+    Args:
+        shard (list): (issue number, issue data) pairs
+        columns_list (list): column names of each output
+        sink_types (list): sink class of each output; see src/sinks.py
+        cfg (dict): user configuration
+
+    Returns:
+        tuple: encoded chunk of the shard for each output, the number of
+        rows in the shard, the invalid issues of the shard, and the
+        {stage: [seconds, count]} timings of the shard if cfg["profile"]
+        is set; see src/profiling.py
+    """
+    all_columns = list(dict.fromkeys(itertools.chain(*columns_list)))
+    explode = cfg.get("explode")
+    profile: bool = cfg.get("profile", False)
+    timings: dict = {}
+
+    if profile:
+        start = time.perf_counter()
+
+    out_rows_list = None
+    invalid: list = []
+
+    if cfg.get("validate", False):
+        out_rows_list, num_rows, invalid = build_validated_rows(
+            shard,
+            columns_list,
+            cfg["separator"],
+            validation.compile_output_validators(
+                columns_list, all_commits=explode is not None
+            ),
+            explode,
+        )
+
+    else:
+        rows = list(build_rows(shard, all_columns, cfg["separator"], explode))
+        num_rows = len(rows)
+
+    encoded: list = []
+
+    if profile:
+        profiling.add_timing(timings, "build", start, num_rows)
+        start = time.perf_counter()
 
-        issue_num (str): issue number
-        issue_data (dict): issue datapoints, such as author
-        separator (str): string used to separate strings composed of other
-        strings, such as comments
+    for out, (columns, sink_type) in enumerate(zip(columns_list, sink_types)):
+        if out_rows_list is not None:
+            out_rows = out_rows_list[out]
+
+        elif columns == all_columns:
+            out_rows = rows
+
+        else:
+            indices = [all_columns.index(col) for col in columns]
+            out_rows = [[row[i] for i in indices] for row in rows]
+
+        encoded.append(sink_type.encode(out_rows, columns, cfg))
+
+    if profile:
+        profiling.add_timing(
+            timings, "encode", start, num_rows * len(columns_list)
+        )
+
+    return encoded, num_rows, invalid, timings
+
+
+def build_chunks(
+    cfg: dict,
+    input_issues: Iterable[tuple],
+    columns_list: list,
+    sink_types: list,
+) -> Iterator[tuple]:
+    """
+    Build and encode rows in chunks of cfg["chunk_size"] issues, or of
+    about as many rows in explode mode; see get_chunk_weight.
+
+    Args:
+        cfg (dict): user configuration
+        input_issues (Iterable[tuple]): (issue number, issue data) pairs
+        columns_list (list): column names of each output
+        sink_types (list): sink class of each output
+
+    Returns:
+        Iterator[tuple]: encoded chunk of each output, row count, invalid
+        issues, and timings; see encode_shard
+    """
+    chunk_size: int = cfg.get("chunk_size", DEFAULT_CHUNK_SIZE)
+
+    for chunk in iter_chunks(input_issues, chunk_size, get_chunk_weight(cfg)):
+        yield encode_shard(chunk, columns_list, sink_types, cfg)
+
+
+def build_chunks_parallel(
+    cfg: dict,
+    input_issues: Iterable[tuple],
+    columns_list: list,
+    sink_types: list,
+) -> Iterator[tuple]:
+    """
+    Build and encode rows in a pool of cfg["workers"] processes.
+
+    Issues are split into shards as by build_chunks. Encoded shards are
+    yielded in the original issue order, so the output is identical to
+    that of build_chunks. Only a small window of shards is in flight at
+    once to keep memory use bounded.
+
+    Args:
+        cfg (dict): user configuration
+        input_issues (Iterable[tuple]): (issue number, issue data) pairs
+        columns_list (list): column names of each output
+        sink_types (list): sink class of each output
+
+    Returns:
+        Iterator[tuple]: encoded chunk of each output, row count, invalid
+        issues, and timings; see encode_shard
+    """
+    workers: int = cfg["workers"]
+    shard_size: int = cfg.get("chunk_size", DEFAULT_CHUNK_SIZE)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: deque = deque()
+
+        for shard in iter_chunks(
+            input_issues, shard_size, get_chunk_weight(cfg)
+        ):
+            pending.append(
+                pool.submit(encode_shard, shard, columns_list, sink_types, cfg)
+            )
+
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+# Extractors for every known column, grouped by the data they read from.
+# Each output type is compiled into a plan that runs only the extractors its
+# columns need; see compile_row_plan.
+#
+# issue columns: (issue number, issue data, separator) -> value
+ISSUE_COL_EXTRACTORS: dict = {
+    "Issue_Num": lambda num, data, sep: num,
+    "Issue_Author_ID": lambda num, data, sep: data["userid"],
+    "Issue_Author_Login": lambda num, data, sep: data["userlogin"],
+    "Issue_Body": lambda num, data, sep: data["body"],
+    "Issue_Closed_Date": lambda num, data, sep: data["closed_at"],
+    "Issue_Comments": lambda num, data, sep: join_comments(data, sep),
+    "Issue_Created_Date": lambda num, data, sep: data["created_at"],
+    "Issue_Title": lambda num, data, sep: data["title"],
+    "isPR": lambda num, data, sep: data["is_pr"],
+    "Num_Comments": lambda num, data, sep: data["num_comments"],
+}
+
+# PR columns, empty for issues that are not PRs:
+#   (issue data, separator) -> value
+PR_COL_EXTRACTORS: dict = {
+    "Num_Review_Comments": lambda data, sep: data["num_review_comments"],
+    "PR_Author_Login": lambda data, sep: data["userlogin"],
+    "PR_Author_Name": lambda data, sep: data["userid"],
+    "PR_Body": lambda data, sep: data["body"],
+    "PR_Closed_Date": lambda data, sep: data["closed_at"],
+    "PR_Title": lambda data, sep: data["title"],
+    "PR_Comments": lambda data, sep: join_comments(data, sep),
+    "Status": lambda data, sep: data["state"],
+}
+
+# commit columns, taken from the last commit of a PR and empty if the PR
+# has no commits: (issue data, commit data, commit files) -> value
+COMMIT_COL_EXTRACTORS: dict = {
+    "Additions": lambda data, commit, files: files["additions"],
+    "Changes": lambda data, commit, files: files["changes"],
+    "Commit_Author_Name": lambda data, commit, files: commit["author_name"],
+    "Commit_Date": lambda data, commit, files: commit["date"],
+    "Commit_Message": lambda data, commit, files: commit["message"],
+    "Deletions": lambda data, commit, files: files["removals"],
+    "File_Names": lambda data, commit, files: files["file_list"],
+    "Num_Changed_Files": lambda data, commit, files: str(
+        len(files["file_list"])
+    ),
+    "Num_Commits": lambda data, commit, files: str(len(data["commits"])),
+    "Patch_Text": lambda data, commit, files: files["patch_text"],
+    "SHA": lambda data, commit, files: commit["sha"],
+}
+
+# columns of the ETL1 schema that the extractor records no data for, e.g.
+# it records the name but not the login of each commit's author. They are
+# kept so that outputs have the expected layout, and are always empty
+EMPTY_COLS = frozenset(("Author_Login", "Committer login"))
+
+# commit columns that hold values of the whole commit, which are only
+# filled in on the first of the rows of a commit in "files" explode mode
+PER_COMMIT_COLS = frozenset(
+    (
+        "Additions",
+        "Changes",
+        "Commit_Message",
+        "Deletions",
+        "Num_Changed_Files",
+        "Patch_Text",
+    )
+)
+
+# keys that must all be present for the commit columns to be filled in
+COMMIT_KEYS = frozenset(("author_name", "date", "files", "message", "sha"))
+COMMIT_FILE_KEYS = frozenset(
+    ("additions", "changes", "file_list", "patch_text", "removals")
+)
+
+
+def join_comments(issue_data: dict, separator: str) -> str:
+    """
+    Join the bodies of an issue's comments into one string.
 
     Notes:
         We must use the separator parameter to distinguish comments in a
@@ -188,146 +860,453 @@ def collect_issue_data(
         commas to separate comments if the CSV uses commas as a column
         separator
 
+    Args:
+        issue_data (dict): issue datapoints
+        separator (str): user-given separator for joining comments
+
     Returns:
-        dict: data from current issue pertaining to issue endpoints.
-    """
-    return {
-        "Issue_Num": issue_num,
-        "Issue_Author_ID": issue_data["userid"],
-        "Issue_Author_Login": issue_data["userlogin"],
-        "Issue_Body": issue_data["body"],
-        "Issue_Closed_Date": issue_data["closed_at"],
-        "Issue_Comments": separator.join(
-            [comment["body"] for _, comment in issue_data["comments"].items()]
-        ),
-        "Issue_Created_Date": issue_data["created_at"],
-        "Issue_Title": issue_data["title"],
-        "isPR": issue_data["is_pr"],
-        "Num_Comments": issue_data["num_comments"],
-    }
+        str: comment bodies joined by the separator
+    """
+    return separator.join(
+        [comment["body"] for comment in issue_data["comments"].values()]
+    )
 
 
-def collect_pr_data(issue_col_tbl: dict, issue_data: dict):
+def get_last_commit(issue_data: dict):
     """
-    Update dict of current row data with current issue's PR datapoints.
+    Get the data and file data of the last commit of a PR.
 
-        issue_col_tbl (dict): current row data
+    Note:
+        commit info all comes from the last commit right now
+
+    Args:
+        issue_data (dict): current issue data
+
+    Returns:
+        tuple | None: (commit data, commit file data) of the last commit. None
+        if the PR has no commits or the last commit is missing any data
+        used by the commit columns.
+    """
+    commits: dict = issue_data.get("commits")
+
+    if not commits:
+        return None
+
+    return _get_complete_commit(next(reversed(commits.values())))
+
+
+def iter_commits(issue_data: dict) -> Iterator[tuple]:
+    """
+    Lazily get the data and file data of every commit of a PR.
+
+    Commits are read straight from the issue data in their original order,
+    without being copied. Commits that are missing any data used by the
+    commit columns are skipped.
+
+    Args:
         issue_data (dict): current issue data
+
+    Returns:
+        Iterator[tuple]: (commit data, commit file data) of each commit
+    """
+    for commit_data in issue_data.get("commits", {}).values():
+        commit = _get_complete_commit(commit_data)
+
+        if commit is not None:
+            yield commit
+
+
+def _get_complete_commit(commit_data: dict):
+    files = commit_data.get("files")
+
+    if (
+        files is None
+        or not COMMIT_KEYS <= commit_data.keys()
+        or not COMMIT_FILE_KEYS <= files.keys()
+    ):
+        return None
+
+    return commit_data, files
+
+
+def compile_row_plan(columns: list):
+    """
+    Compile a function that builds only the given columns of a row.
+
+    Extractors for columns that are not selected are never run, so e.g.
+    comments are only joined when a comment column is part of the output.
+
+    Args:
+        columns (list): column names to build, in output order
+
+    Raises:
+        KeyError: if a column has no known extractor
+
+    Returns:
+        Callable[[str, dict, str], list]: function of issue number, issue
+        data, and separator that returns the ordered row values
+    """
+    issue_plan, pr_plan, commit_plan = _split_row_plan(columns)
+    num_cols = len(columns)
+
+    def build_row(issue_num: str, issue_data: dict, separator: str) -> list:
+        row: list = [""] * num_cols
+
+        for i, extract in issue_plan:
+            row[i] = extract(issue_num, issue_data, separator)
+
+        if issue_data["is_pr"] is True:
+            for i, extract in pr_plan:
+                row[i] = extract(issue_data, separator)
+
+            if commit_plan:
+                last_commit = get_last_commit(issue_data)
+
+                if last_commit is not None:
+                    for i, extract in commit_plan:
+                        row[i] = extract(issue_data, *last_commit)
+
+        return row
+
+    return build_row
+
+
+def compile_exploded_row_plan(columns: list, explode: str):
+    """
+    Compile a function that builds a row per commit or per changed file.
+
+    Commit columns are filled from each commit in turn instead of only the
+    last one. In "files" mode, each commit is further split into one row
+    per name in its file list, with File_Names holding only that name.
+    The extractor records only per-commit counts and patches, so the
+    columns in PER_COMMIT_COLS, e.g. Additions and Patch_Text, are only
+    filled in on the first row of each commit and left empty on the rest.
+    Their values are then neither counted twice when summed nor repeated
+    once per file.
+
+    Issues that are not PRs, PRs without commits, and outputs without
+    commit columns still get exactly one row.
+
+    Args:
+        columns (list): column names to build, in output order
+        explode (str): one of EXPLODE_MODES
+
+    Raises:
+        KeyError: if a column has no known extractor
+        ValueError: if explode is not a known mode
+
+    Returns:
+        Callable[[str, dict, str], Iterator[list]]: generator function of
+        issue number, issue data, and separator that lazily yields the
+        ordered rows of the issue
     """
-    if issue_col_tbl["isPR"] is True:
-        # PR data
-        issue_col_tbl["Num_Review_Comments"] = issue_data[
-            "num_review_comments"
+    if explode not in EXPLODE_MODES:
+        raise ValueError(f'Unknown explode mode "{explode}"')
+
+    issue_plan, pr_plan, commit_plan = _split_row_plan(columns)
+    num_cols = len(columns)
+
+    file_names_index = None
+    per_commit_indices: list = []
+
+    if explode == "files":
+        if "File_Names" in columns:
+            file_names_index = columns.index("File_Names")
+
+        per_commit_indices = [
+            i for i, col in enumerate(columns) if col in PER_COMMIT_COLS
         ]
-        issue_col_tbl["PR_Author_Login"] = issue_data["userlogin"]
-        issue_col_tbl["PR_Author_Name"] = issue_data["userid"]
-        issue_col_tbl["PR_Body"] = issue_data["body"]
-        issue_col_tbl["PR_Closed_Date"] = issue_data["closed_at"]
-        issue_col_tbl["PR_Title"] = issue_data["title"]
-        issue_col_tbl["PR_Comments"] = issue_col_tbl["Issue_Comments"]
-        issue_col_tbl["Status"] = issue_data["state"]
-
-        # Commit data
-        try:
-            commits = list(issue_data["commits"].items())
-
-        # put this into an else block?
-            if commits:
-                last_commit = commits[-1]
-                commit_data = last_commit[1]
-                files = commit_data["files"]
-
-                issue_col_tbl["Additions"] = files["additions"]
-                issue_col_tbl["Changes"] = files["changes"]
-                issue_col_tbl["Commit_Author_Name"] = commit_data["author_name"]
-                issue_col_tbl["Commit_Date"] = commit_data["date"]
-                issue_col_tbl["Commit_Message"] = commit_data["message"]
-                issue_col_tbl["Deletions"] = files["removals"]
-                issue_col_tbl["File_Names"] = files["file_list"]
-                issue_col_tbl["Num_Changed_Files"] = str(len(files["file_list"]))
-                issue_col_tbl["Num_Commits"] = str(len(issue_data["commits"]))
-                issue_col_tbl["Patch_Text"] = files["patch_text"]
-                issue_col_tbl["SHA"] = commit_data["sha"]
 
-            else:
-                for key in [
-                    "Additions",
-                    "Changes",
-                    "Commit_Author_Name",
-                    "Commit_Date",
-                    "Commit_Message",
-                    "Deletions",
-                    "File_Names",
-                    "Num_Changed_Files",
-                    "Num_Commits",
-                    "Patch_Text",
-                    "SHA",
-                ]:
-                    issue_col_tbl[key] = ""
-
-        except KeyError:
-            for key in [
-                "Additions",
-                "Changes",
-                "Commit_Author_Name",
-                "Commit_Date",
-                "Commit_Message",
-                "Deletions",
-                "File_Names",
-                "Num_Changed_Files",
-                "Num_Commits",
-                "Patch_Text",
-                "SHA",
-            ]:
-                issue_col_tbl[key] = ""
+    def build_issue_rows(
+        issue_num: str, issue_data: dict, separator: str
+    ) -> Iterator[list]:
+        row: list = [""] * num_cols
 
-    else:
-        for key in [
-            "Num_Review_Comments",
-            "PR_Author_Login",
-            "PR_Author_Name",
-            "PR_Body",
-            "PR_Closed_Date",
-            "PR_Title",
-            "PR_Comments",
-            "Status",
-            "Additions",
-            "Changes",
-            "Commit_Author_Name",
-            "Commit_Date",
-            "Commit_Message",
-            "Deletions",
-            "File_Names",
-            "Num_Changed_Files",
-            "Num_Commits",
-            "Patch_Text",
-            "SHA",
-        ]:
-            issue_col_tbl[key] = ""
+        for i, extract in issue_plan:
+            row[i] = extract(issue_num, issue_data, separator)
+
+        if issue_data["is_pr"] is not True:
+            yield row
+            return
+
+        for i, extract in pr_plan:
+            row[i] = extract(issue_data, separator)
+
+        if not commit_plan:
+            yield row
+            return
+
+        num_rows = 0
+
+        for commit_data, files in iter_commits(issue_data):
+            commit_row = row.copy()
 
-    return issue_col_tbl
+            for i, extract in commit_plan:
+                commit_row[i] = extract(issue_data, commit_data, files)
 
+            if explode == "commits" or not files["file_list"]:
+                num_rows += 1
+                yield commit_row
+                continue
 
-def write_rows(cfg: dict, out_rows: list) -> None:
+            for j, file_name in enumerate(files["file_list"]):
+                file_row = commit_row.copy()
+
+                if j:
+                    for i in per_commit_indices:
+                        file_row[i] = ""
+
+                if file_names_index is not None:
+                    file_row[file_names_index] = [file_name]
+
+                num_rows += 1
+                yield file_row
+
+        if not num_rows:
+            yield row
+
+    return build_issue_rows
+
+
+def compile_issue_plan(columns: list, explode=None):
+    """
+    Compile a function that builds all rows of an issue at once.
+
+    Args:
+        columns (list): column names to build, in output order
+        explode (str | None): see build_rows
+
+    Returns:
+        Callable[[str, dict, str], list]: function of issue number, issue
+        data, and separator that returns the ordered rows of the issue
     """
-    Write gathered rows to the output CSV.
+    if explode is not None:
+        build_issue_rows = compile_exploded_row_plan(columns, explode)
+
+        return lambda num, data, sep: list(build_issue_rows(num, data, sep))
+
+    build_row = compile_row_plan(columns)
+
+    return lambda num, data, sep: [build_row(num, data, sep)]
+
+
+def _split_row_plan(columns: list) -> tuple:
+    issue_plan: list = []
+    pr_plan: list = []
+    commit_plan: list = []
+
+    for i, col in enumerate(columns):
+        if col in ISSUE_COL_EXTRACTORS:
+            issue_plan.append((i, ISSUE_COL_EXTRACTORS[col]))
+
+        elif col in PR_COL_EXTRACTORS:
+            pr_plan.append((i, PR_COL_EXTRACTORS[col]))
+
+        elif col in COMMIT_COL_EXTRACTORS:
+            commit_plan.append((i, COMMIT_COL_EXTRACTORS[col]))
+
+        elif col not in EMPTY_COLS:
+            raise KeyError(f'No extractor exists for column "{col}"')
+
+    return issue_plan, pr_plan, commit_plan
+
+
+def write_chunks(
+    cfg: dict,
+    targets: list,
+    columns_list: list,
+    sink_types: list,
+    chunks: Iterable[tuple],
+    report=None,
+    profiler=None,
+) -> None:
+    """
+    Write encoded chunks to every output.
+
+    Each chunk is written before the next one is requested, so memory use
+    stays flat regardless of the number of rows.
+
+        cfg (dict): user configuration
+        targets (list): dicts with "output_type" and "output_csv" keys
+        columns_list (list): column names of each output
+        sink_types (list): sink class of each output
+        chunks (Iterable[tuple]): encoded chunk of each output, the number
+            of rows in it, its invalid issues, and its timings
+        report (ValidationReport | None): report of invalid issues
+        profiler (ExportProfiler | None): profiler to record timings in
+
+        Returns: None
+    """
+    num_written = 0
+
+    with ExitStack() as stack:
+        out_sinks: list = []
+
+        for target, columns, sink_type in zip(
+            targets, columns_list, sink_types
+        ):
+            sink = sink_type(target["output_csv"], columns, cfg)
+            stack.callback(sink.close)
+            out_sinks.append(sink)
+
+        for encoded, num_rows, invalid, timings in chunks:
+            if profiler is not None:
+                profiler.merge(timings)
+                start = time.perf_counter()
+
+            for sink, encoded_chunk in zip(out_sinks, encoded):
+                sink.write(encoded_chunk)
+
+            if profiler is not None:
+                profiling.add_timing(
+                    profiler.timings, "write", start, num_rows
+                )
+
+            if invalid:
+                report.add(invalid)
+
+            num_written += num_rows
+            print_progress(num_written)
+
+    print(file=sys.stderr)
+
+
+def export_incremental(
+    cfg: dict,
+    input_issues: Iterable[tuple],
+    targets: list,
+    columns_list: list,
+    report=None,
+) -> None:
+    """
+    Update existing outputs with only the new or changed issues.
+
+    Each output keeps a manifest of the hash and byte range of every row;
+    see src/incremental.py. Rows of unchanged issues are reused from the
+    previous export without being built or encoded. Rows are written one
+    issue at a time so that their byte ranges can be recorded, so
+    cfg["workers"] is not used in this mode, and neither is
+    cfg["spill_threshold"]. Only uncompressed CSV outputs are supported.
 
         cfg (dict): user configuration
-        out_rows (list): list of lists of row data to write
+        input_issues (Iterable[tuple]): (issue number, issue data, issue
+            text) of each issue; see get_input_issues
+        targets (list): dicts with "output_type" and "output_csv" keys
+        columns_list (list): column names of each output
+        report (ValidationReport | None): report of invalid issues. Issues
+            are not validated if None.
+
+        Raises:
+            ValueError: if an output is not a CSV
 
         Returns: None
     """
-    with open(cfg["output_csv"], "w", newline="", encoding="utf-8") as out_csv:
+    delimiter: str = cfg["delimiter"]
+    separator: str = cfg["separator"]
+    explode = cfg.get("explode")
+
+    for target in targets:
+        out_path: str = target["output_csv"]
+
+        if (
+            sinks.get_sink_type(out_path) is not sinks.CSVSink
+            or os.path.splitext(out_path)[1].lower() in (".gz", ".zst")
+        ):
+            raise ValueError(
+                "Incremental export only supports uncompressed CSV outputs:"
+                f' "{out_path}"'
+            )
+
+    all_columns = list(dict.fromkeys(itertools.chain(*columns_list)))
+    validate = validation.compile_output_validators(
+        columns_list, all_commits=explode is not None
+    )
+    build_issue_rows = compile_issue_plan(all_columns, explode)
+    out_plans = [
+        compile_issue_plan(columns, explode) for columns in columns_list
+    ]
+    projections = [
+        [all_columns.index(col) for col in columns] for columns in columns_list
+    ]
 
-        writer = csv.writer(
-            out_csv,
-            quoting=csv.QUOTE_MINIMAL,
-            delimiter=cfg["delimiter"],
-            quotechar='"',
-            # escapechar="",
+    writers = [
+        incremental.IncrementalCSVWriter(
+            target["output_csv"],
+            sinks.encode_csv_rows([columns], delimiter).encode("utf-8"),
+            {
+                "columns": columns,
+                "delimiter": delimiter,
+                "separator": separator,
+                "filters": cfg.get("filters", {}),
+                "explode": explode,
+            },
         )
+        for target, columns in zip(targets, columns_list)
+    ]
 
-        writer.writerows(out_rows)
+    num_read = 0
+
+    for num, data, text in input_issues:
+        out_errors = [[]] * len(writers)
+
+        if report is not None:
+            out_errors = validate(data)
+
+            if any(out_errors):
+                report.add([(num, out_errors, data)])
+
+        digest = incremental.hash_issue(text)
+        rows = None
+
+        for writer, build_out_rows, indices, errors in zip(
+            writers, out_plans, projections, out_errors
+        ):
+            # invalid issues are left out like removed ones
+            if errors:
+                continue
+
+            if writer.is_current(num, digest):
+                writer.write(num, digest, None)
+                continue
+
+            # exploded issues keep all of their rows in one byte range
+            if any(out_errors):
+                # fields read only by other outputs may be missing; see
+                # build_validated_rows
+                out_rows = build_out_rows(num, data, separator)
+
+            else:
+                if rows is None:
+                    rows = build_issue_rows(num, data, separator)
+
+                out_rows = [[row[i] for i in indices] for row in rows]
+
+            row_text = sinks.encode_csv_rows(out_rows, delimiter)
+            writer.write(num, digest, row_text.encode("utf-8"))
+
+        num_read += 1
+        print_progress(num_read)
+
+    print(file=sys.stderr)
+
+    for writer in writers:
+        writer.close()
+
+        print(
+            f"{writer.out_path}: {writer.num_encoded} rows encoded,"
+            f" {writer.num_reused} rows reused"
+        )
+
+
+def print_progress(num_rows: int) -> None:
+    """
+    Overwrite the current line of stderr with a count of processed rows.
+
+        num_rows (int): number of rows processed so far
+
+        Returns: None
+    """
+    print(f"\rRows written: {num_rows}", end="", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,224 @@
+"""
+Sidecar store for large CSV fields.
+
+Fields longer than cfg["spill_threshold"] characters, such as patch texts
+and issue bodies, are moved out of the output CSV into a blob file next to
+it, "<output>.blobs". The CSV cell holds a reference to the field's UTF-8
+bytes in the blob file instead, e.g. "@blob:1024:52311" for 52311 bytes at
+offset 1024. Identical fields are stored once. Fields that are kept but
+start like a reference, e.g. "@blob:0:5", are escaped with one more "@".
+
+References are resolved, and escaped fields unescaped, lazily with
+BlobReader:
+
+    with BlobReader("out.csv.blobs") as blobs:
+        for row in csv.reader(csv_file):
+            patch_text = blobs.resolve(row[6])
+"""
+
+import hashlib
+import mmap
+import re
+
+BLOB_REF_PREFIX = "@blob:"
+BLOB_FILE_SUFFIX = ".blobs"
+
+_REF = re.compile(re.escape(BLOB_REF_PREFIX) + r"(\d+):(\d+)")
+
+# fields that start like a reference, and fields escaped in turn
+_NEEDS_ESCAPE = re.compile(r"@+" + re.escape(BLOB_REF_PREFIX[1:]))
+_ESCAPED = re.compile(r"@" + _NEEDS_ESCAPE.pattern)
+
+
+def encode_spilled_rows(
+    rows: list, threshold: int, delimiter: str, encode_rows
+) -> tuple:
+    """
+    Encode rows as CSV text, leaving out values longer than threshold.
+
+    Runs where rows are encoded, possibly in worker processes, before the
+    offsets of the values in the blob file are known. The text is split
+    where each left out value belongs, so that BlobWriter.join_pieces can
+    put references exactly there later, without searching the text.
+
+    Args:
+        rows (list): lists of row data
+        threshold (int): maximum length of values kept in the rows
+        delimiter (str): delimiter of the CSV
+        encode_rows (Callable[[list, str], str]): function of rows and
+            delimiter that encodes rows as CSV text
+
+    Returns:
+        tuple: pieces of the encoded rows, which alternate between CSV text
+        and the content hash of the value that belongs between two texts,
+        and {hash: UTF-8 bytes} of the values left out
+    """
+    pieces: list = [""]
+    blobs: dict = {}
+    kept_rows: list = []
+
+    for row in rows:
+        if not any(_is_large(val, threshold) for val in row):
+            kept_rows.append([_escape(val) for val in row])
+            continue
+
+        if kept_rows:
+            pieces[-1] += encode_rows(kept_rows, delimiter)
+            kept_rows = []
+
+        for i, val in enumerate(row):
+            if i:
+                pieces[-1] += delimiter
+
+            if _is_large(val, threshold):
+                data = val.encode("utf-8")
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+                blobs[digest] = data
+                pieces += [digest, ""]
+
+            # a row of one empty field is written as '""', which is not how
+            # the field would be written as part of a longer row
+            elif val is not None and val != "":
+                pieces[-1] += encode_rows([[_escape(val)]], delimiter)[:-2]
+
+        pieces[-1] += "\r\n"
+
+    if kept_rows:
+        pieces[-1] += encode_rows(kept_rows, delimiter)
+
+    return pieces, blobs
+
+
+def _is_large(val, threshold: int) -> bool:
+    return isinstance(val, str) and len(val) > threshold
+
+
+def _escape(val):
+    if isinstance(val, str) and _NEEDS_ESCAPE.match(val):
+        return "@" + val
+
+    return val
+
+
+class BlobWriter:
+    """Append deduplicated blobs to a blob file."""
+
+    def __init__(self, blob_path: str) -> None:
+        """
+        Create the blob file.
+
+        Args:
+            blob_path (str): path to the blob file
+        """
+        self.blob_path = blob_path
+        self.blob_file = open(blob_path, "wb")
+
+        # {content hash: reference} of every stored blob
+        self.refs: dict = {}
+
+    def put(self, digest: str, data: bytes) -> str:
+        """
+        Store a blob unless a blob with the same hash is stored already.
+
+        Args:
+            digest (str): content hash of the blob
+            data (bytes): contents of the blob
+
+        Returns:
+            str: reference to the blob
+        """
+        ref = self.refs.get(digest)
+
+        if ref is None:
+            ref = f"{BLOB_REF_PREFIX}{self.blob_file.tell()}:{len(data)}"
+            self.blob_file.write(data)
+            self.refs[digest] = ref
+
+        return ref
+
+    def join_pieces(self, pieces: list, blobs: dict) -> str:
+        """
+        Store blobs and join encoded pieces with references to them.
+
+        Args:
+            pieces (list): pieces of encoded rows from encode_spilled_rows
+            blobs (dict): {hash: UTF-8 bytes} from encode_spilled_rows
+
+        Returns:
+            str: CSV text with references in place of the values left out
+        """
+        if not blobs:
+            return "".join(pieces)
+
+        refs = {
+            digest: self.put(digest, data) for digest, data in blobs.items()
+        }
+
+        # texts are at even and hashes at odd indices
+        return "".join(
+            refs[piece] if i % 2 else piece for i, piece in enumerate(pieces)
+        )
+
+    def close(self) -> None:
+        """Close the blob file."""
+        self.blob_file.close()
+
+
+class BlobReader:
+    """Resolve references in CSV cells to the fields stored in a blob file."""
+
+    def __init__(self, blob_path: str) -> None:
+        """
+        Memory-map the blob file.
+
+        Args:
+            blob_path (str): path to the blob file
+        """
+        self.blob_file = open(blob_path, "rb")
+        self.blob_map = None
+
+        # mmap cannot map empty files
+        if self.blob_file.seek(0, 2):
+            self.blob_map = mmap.mmap(
+                self.blob_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def resolve(self, value: str) -> str:
+        """
+        Get the field a CSV cell refers to.
+
+        Args:
+            value (str): CSV cell
+
+        Returns:
+            str: the referenced field, the unescaped field if it was
+            escaped, or value itself
+        """
+        if value[:1] != "@":
+            return value
+
+        if _ESCAPED.match(value):
+            return value[1:]
+
+        match = _REF.fullmatch(value)
+
+        if match is None:
+            return value
+
+        offset, length = int(match.group(1)), int(match.group(2))
+
+        return self.blob_map[offset : offset + length].decode("utf-8")
+
+    def close(self) -> None:
+        """Close the blob file."""
+        if self.blob_map is not None:
+            self.blob_map.close()
+
+        self.blob_file.close()
@@ -3,12 +3,53 @@ Utilites for reading from and writing to files.
 
 json docs:
     https://docs.python.org/3/library/json.html
+
+zstandard docs:
+    https://python-zstandard.readthedocs.io/en/latest/
+
+orjson docs:
+    https://github.com/ijl/orjson
 """
 
+import gzip
+import hashlib
 import json
 from json.decoder import JSONDecodeError
+import mmap
 import os
+import pickle
+import re
 import sys
+from typing import Iterator
+
+try:
+    import zstandard
+
+except ImportError:
+    zstandard = None
+
+try:
+    import orjson
+
+except ImportError:
+    orjson = None
+
+# size of each read when streaming JSON out of a file
+STREAM_READ_SIZE = 1 << 20
+
+# sidecar index of member byte spans; see index_jsonfile
+JSON_INDEX_SUFFIX = ".index.json"
+
+# parsed JSON cache; see read_jsonfile_into_dict
+JSON_CACHE_INDEX = "index.json"
+JSON_CACHE_MAX_BYTES = 4 << 30
+JSON_CACHE_SUFFIX = f".p{pickle.HIGHEST_PROTOCOL}.pickle"
+
+# serializers of write_dict_to_jsonfile
+JSON_SERIALIZERS = ("indent", "compact", "orjson")
+
+_JSON_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
 
 
 def mk_json_outpath(out_path: str):
@@ -48,6 +89,50 @@ def mk_json_outpath(out_path: str):
         pass
 
 
+def open_text_file(path: str, mode: str = "r", newline=None):
+    """
+    Open a text file, compressing or decompressing it by its extension.
+
+    Files ending in ".gz" are opened with gzip and files ending in ".zst"
+    with zstandard. Both stream, so compressed files never have to be
+    held in memory or on disk uncompressed. All other files are opened as
+    plain text.
+
+    Args:
+        path (str): path to file to open.
+        mode (str): "r", "w", "x", or "a".
+        newline (str | None): newline handling, as for open().
+
+    Raises:
+        ImportError: hard exit if a ".zst" file is opened without
+        zstandard installed.
+
+    Returns:
+        TextIO: file object of the file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".gz":
+        return gzip.open(
+            path,
+            mode + "t",
+            compresslevel=6,
+            encoding="UTF-8",
+            newline=newline,
+        )
+
+    if extension == ".zst":
+        if zstandard is None:
+            print(f'\nReading or writing "{path}" requires zstandard!')
+            sys.exit(1)
+
+        return zstandard.open(
+            path, mode + "t", encoding="UTF-8", newline=newline
+        )
+
+    return open(path, mode, encoding="UTF-8", newline=newline)
+
+
 def _read_json_into_text(in_path: str) -> str:
     """
     Read file contents into string.
@@ -64,7 +149,7 @@ def _read_json_into_text(in_path: str) -> str:
         str: text from file.
     """
     try:
-        with open(in_path, "r", encoding="UTF-8") as file_obj:
+        with open_text_file(in_path, "r") as file_obj:
             json_text = file_obj.read()
 
     except FileNotFoundError:
@@ -75,6 +160,333 @@ def _read_json_into_text(in_path: str) -> str:
         return json_text
 
 
+class _JSONObjectStream:
+    """
+    Incrementally decode the members of a top-level JSON object.
+
+    Only the member currently being decoded is held in memory, so peak
+    memory is bounded by the largest single member rather than by the size
+    of the whole file.
+    """
+
+    def __init__(self, file_obj) -> None:
+        """
+        Initialize stream over an open text file.
+
+        Args:
+            file_obj (TextIO): file positioned at the start of the JSON text.
+        """
+        self.file_obj = file_obj
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+        # offset of the start of the buffer from the start of the file
+        self.offset = 0
+
+    def __fill(self) -> None:
+        # drop consumed text and read at least as much as is buffered so
+        # that a member larger than the buffer is re-scanned only a
+        # logarithmic number of times
+        read_size = max(STREAM_READ_SIZE, len(self.buf) - self.pos)
+        data = self.file_obj.read(read_size)
+
+        if not data:
+            self.eof = True
+
+        self.offset += self.pos
+        self.buf = self.buf[self.pos :] + data
+        self.pos = 0
+
+    def __skip_whitespace(self) -> None:
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+
+            if self.pos < len(self.buf) or self.eof:
+                return
+
+            self.__fill()
+
+    def __expect(self, char: str) -> None:
+        self.__skip_whitespace()
+
+        if self.buf[self.pos : self.pos + 1] != char:
+            raise JSONDecodeError(f"Expecting '{char}'", self.buf, self.pos)
+
+        self.pos += 1
+
+    def __decode_value(self):
+        self.__skip_whitespace()
+
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.buf, self.pos)
+
+            except JSONDecodeError:
+                if self.eof:
+                    raise
+
+                self.__fill()
+
+            else:
+                # a number ending exactly at the buffer edge may continue
+                # in the next read
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+
+                self.__fill()
+
+    def items(self) -> Iterator[tuple]:
+        """
+        Yield (key, value) pairs of the top-level object in file order.
+
+        Raises:
+            JSONDecodeError: if the file text is not a JSON object.
+
+        Returns:
+            Iterator[tuple]: decoded members of the top-level object.
+        """
+        for key, value, _, _ in self.members():
+            yield key, value
+
+    def members(self) -> Iterator[tuple]:
+        """
+        Yield the members of the top-level object and where their values lie.
+
+        Raises:
+            JSONDecodeError: if the file text is not a JSON object.
+
+        Returns:
+            Iterator[tuple]: (key, value, text, start) of each member, where
+            text is the JSON text of the value as it appears in the file and
+            start is its offset from the start of the file, in characters.
+        """
+        self.__skip_whitespace()
+
+        # an empty file is treated as an empty object, matching
+        # read_jsontext_into_dict
+        if self.pos >= len(self.buf):
+            return
+
+        self.__expect("{")
+        self.__skip_whitespace()
+
+        if self.buf[self.pos : self.pos + 1] == "}":
+            return
+
+        while True:
+            key = self.__decode_value()
+            self.__expect(":")
+            self.__skip_whitespace()
+
+            start = self.offset + self.pos
+            value = self.__decode_value()
+
+            # reads while decoding only drop text before the value
+            text = self.buf[start - self.offset : self.pos]
+
+            yield key, value, text, start
+
+            self.__skip_whitespace()
+            next_char = self.buf[self.pos : self.pos + 1]
+            self.pos += 1
+
+            if next_char == "}":
+                return
+
+            if next_char != ",":
+                raise JSONDecodeError(
+                    "Expecting ',' delimiter", self.buf, self.pos - 1
+                )
+
+
+def iter_jsonfile_items(in_path: str) -> Iterator[tuple]:
+    """
+    Lazily yield the members of the top-level object in a JSON file.
+
+    Used for streaming large extractor outputs one issue at a time instead
+    of reading the entire file into a dictionary.
+
+    Args:
+        in_path (str): path to JSON file to read from.
+
+    Raises:
+        FileNotFoundError: hard exit if a file cannot be found.
+
+    Returns:
+        Iterator[tuple]: (key, value) pairs, e.g. (issue number, issue data).
+    """
+    for key, value, _ in iter_jsonfile_members(in_path):
+        yield key, value
+
+
+def iter_jsonfile_members(in_path: str) -> Iterator[tuple]:
+    """
+    Lazily yield the members of the top-level object in a JSON file along
+    with the text they were decoded from.
+
+    The text can be hashed to tell whether a member changed between two
+    versions of a file without encoding the decoded value again.
+
+    Args:
+        in_path (str): path to JSON file to read from.
+
+    Raises:
+        FileNotFoundError: hard exit if a file cannot be found.
+
+    Returns:
+        Iterator[tuple]: (key, value, text) of each member, where text is
+        the JSON text of the value.
+    """
+    try:
+        file_obj = open_text_file(in_path, "r")
+
+    except FileNotFoundError:
+        print(f'\nFile at "{in_path}" not found!')
+        sys.exit(1)
+
+    with file_obj:
+        stream = _JSONObjectStream(file_obj)
+
+        for key, value, text, _ in stream.members():
+            yield key, value, text
+
+
+def index_jsonfile(in_path: str) -> dict:
+    """
+    Index the byte span of every member of the top-level object in a file.
+
+    The index is written next to the file and is only valid while the
+    file's size and modification time are unchanged.
+
+    Args:
+        in_path (str): path to uncompressed JSON file to index.
+
+    Raises:
+        FileNotFoundError: hard exit if a file cannot be found.
+        ValueError: hard exit if the file is compressed.
+
+    Returns:
+        dict: {key: [start byte, end byte]} of each member's value
+    """
+    if os.path.splitext(in_path)[1].lower() in (".gz", ".zst"):
+        print(f'\nCompressed file at "{in_path}" cannot be indexed!')
+        sys.exit(1)
+
+    try:
+        stat = os.stat(in_path)
+
+    except FileNotFoundError:
+        print(f'\nFile at "{in_path}" not found!')
+        sys.exit(1)
+
+    # latin-1 maps each byte to one character, so character offsets are
+    # byte offsets. JSON syntax characters are ASCII, which never occur
+    # inside multi-byte UTF-8 characters, so the spans found are exact
+    with open(in_path, "r", encoding="latin-1", newline="") as file_obj:
+        spans: dict = {
+            key.encode("latin-1").decode("UTF-8"): [start, start + len(text)]
+            for key, _, text, start in _JSONObjectStream(file_obj).members()
+        }
+
+    index = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "spans": spans,
+    }
+
+    tmp_path = f"{in_path}{JSON_INDEX_SUFFIX}.{os.getpid()}.tmp"
+
+    with open(tmp_path, "w", encoding="UTF-8") as index_file:
+        json.dump(index, index_file, ensure_ascii=False)
+
+    os.replace(tmp_path, in_path + JSON_INDEX_SUFFIX)
+
+    return spans
+
+
+def read_jsonfile_index(in_path: str) -> dict:
+    """
+    Read the index of a JSON file, indexing the file if needed.
+
+    Args:
+        in_path (str): path to uncompressed JSON file.
+
+    Returns:
+        dict: {key: [start byte, end byte]} of each member's value
+    """
+    index_path = in_path + JSON_INDEX_SUFFIX
+
+    if os.path.exists(index_path) and os.path.exists(in_path):
+        index: dict = read_jsonfile_into_dict(index_path)
+        stat = os.stat(in_path)
+
+        if (
+            index.get("size") == stat.st_size
+            and index.get("mtime_ns") == stat.st_mtime_ns
+        ):
+            return index["spans"]
+
+    return index_jsonfile(in_path)
+
+
+def iter_indexed_jsonfile_items(in_path: str, keys: list) -> Iterator[tuple]:
+    """
+    Yield only the given members of the top-level object in a JSON file.
+
+    The file is memory-mapped and only the text of the requested members is
+    parsed, using the file's index; see index_jsonfile.
+
+    Args:
+        in_path (str): path to uncompressed JSON file to read from.
+        keys (list): keys of the members to read, e.g. issue numbers.
+
+    Returns:
+        Iterator[tuple]: (key, value) pairs in file order. Keys that are
+        not in the file are reported and skipped.
+    """
+    for key, value, _ in iter_indexed_jsonfile_members(in_path, keys):
+        yield key, value
+
+
+def iter_indexed_jsonfile_members(in_path: str, keys: list) -> Iterator[tuple]:
+    """
+    Yield only the given members of a JSON file along with their text.
+
+    Args:
+        in_path (str): path to uncompressed JSON file to read from.
+        keys (list): keys of the members to read, e.g. issue numbers.
+
+    Returns:
+        Iterator[tuple]: (key, value, text) of each member in file order;
+        see iter_indexed_jsonfile_items and iter_jsonfile_members.
+    """
+    spans: dict = read_jsonfile_index(in_path)
+    found_keys: list = []
+
+    for key in dict.fromkeys(keys):
+        if key in spans:
+            found_keys.append(key)
+
+        else:
+            print(f'Key "{key}" not found in "{in_path}"', file=sys.stderr)
+
+    if not found_keys:
+        return
+
+    found_keys.sort(key=lambda key: spans[key][0])
+
+    with open(in_path, "rb") as file_obj, mmap.mmap(
+        file_obj.fileno(), 0, access=mmap.ACCESS_READ
+    ) as json_map:
+        for key in found_keys:
+            start, end = spans[key]
+            text = json_map[start:end].decode("utf-8")
+
+            yield key, json.loads(text), text
+
+
 def read_file_line(in_path: str) -> str:
     """
     Read a single line from the top of a text file.
@@ -102,16 +514,32 @@ def read_file_line(in_path: str) -> str:
         return file_text.strip().strip("\n")
 
 
-def read_jsonfile_into_dict(in_path: str) -> dict:
+def read_jsonfile_into_dict(
+    in_path: str, cache_dir=None, cache_max_bytes=None
+) -> dict:
     """
     Read the contents of the provided JSON file into a dictionary.
 
+    If a cache directory is given, the parsed contents are pickled there
+    and later reads of the same, unchanged file load them instead of
+    parsing the JSON again. Cache entries are shared by every caller that
+    uses the same cache directory.
+
     Args:
         in_path (str): path to JSON file to read from.
+        cache_dir (str | None): directory of the parsed JSON cache. Caching
+            is disabled if None.
+        cache_max_bytes (int | None): size bound of the cache directory.
+            Defaults to JSON_CACHE_MAX_BYTES.
 
     Returns:
         dict: dictionary constructed from JSON contents.
     """
+    if cache_dir is not None:
+        return _read_cached_jsonfile(
+            in_path, cache_dir, cache_max_bytes or JSON_CACHE_MAX_BYTES
+        )
+
     json_text = _read_json_into_text(in_path)
 
     json_dict = read_jsontext_into_dict(json_text)
@@ -119,6 +547,123 @@ def read_jsonfile_into_dict(in_path: str) -> dict:
     return json_dict
 
 
+def _read_cached_jsonfile(
+    in_path: str, cache_dir: str, cache_max_bytes: int
+) -> dict:
+    """
+    Read a JSON file through the parsed JSON cache.
+
+    Entries are named by a hash of the file's contents, so a file that is
+    copied or touched without changing still hits the cache. To avoid
+    hashing the file on every read, an index maps each file's path, size,
+    and modification time to the content hash last seen for it. The least
+    recently used entries are evicted once the entries take up more than
+    cache_max_bytes. Entries are pickles, so the cache directory must only
+    be writable by trusted users.
+
+    Args:
+        in_path (str): path to JSON file to read from.
+        cache_dir (str): directory of the parsed JSON cache.
+        cache_max_bytes (int): size bound of the cache directory.
+
+    Raises:
+        FileNotFoundError: hard exit if a file cannot be found.
+
+    Returns:
+        dict: dictionary constructed from JSON contents.
+    """
+    try:
+        stat = os.stat(in_path)
+
+    except FileNotFoundError:
+        print(f'\nFile at "{in_path}" not found!')
+        sys.exit(1)
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    index_path = os.path.join(cache_dir, JSON_CACHE_INDEX)
+    index: dict = {}
+
+    if os.path.exists(index_path):
+        index = read_jsonfile_into_dict(index_path)
+
+    stat_key = f"{os.path.abspath(in_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    content_hash = index.get(stat_key) or _hash_file(in_path)
+    entry_path = os.path.join(cache_dir, content_hash + JSON_CACHE_SUFFIX)
+
+    try:
+        with open(entry_path, "rb") as entry_file:
+            json_dict = pickle.load(entry_file)
+
+        # mark entry as recently used
+        os.utime(entry_path)
+
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        json_dict = read_jsontext_into_dict(_read_json_into_text(in_path))
+
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, "wb") as entry_file:
+            pickle.dump(
+                json_dict, entry_file, protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+        os.replace(tmp_path, entry_path)
+
+        _evict_json_cache(cache_dir, cache_max_bytes, keep=entry_path)
+
+    if index.get(stat_key) != content_hash:
+        index[stat_key] = content_hash
+
+        # drop index entries of evicted cache entries
+        index = {
+            key: val
+            for key, val in index.items()
+            if os.path.exists(os.path.join(cache_dir, val + JSON_CACHE_SUFFIX))
+        }
+
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, "w", encoding="UTF-8") as index_file:
+            json.dump(index, index_file, ensure_ascii=False)
+
+        os.replace(tmp_path, index_path)
+
+    return json_dict
+
+
+def _hash_file(in_path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+
+    with open(in_path, "rb") as file_obj:
+        while data := file_obj.read(1 << 20):
+            digest.update(data)
+
+    return digest.hexdigest()
+
+
+def _evict_json_cache(cache_dir: str, cache_max_bytes: int, keep: str):
+    entries = [
+        entry
+        for entry in os.scandir(cache_dir)
+        if entry.name.endswith(JSON_CACHE_SUFFIX) and entry.path != keep
+    ]
+
+    total_bytes = os.path.getsize(keep) + sum(
+        entry.stat().st_size for entry in entries
+    )
+
+    # least recently used first
+    entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+
+    for entry in entries:
+        if total_bytes <= cache_max_bytes:
+            break
+
+        total_bytes -= entry.stat().st_size
+        os.remove(entry.path)
+
+
 def read_jsontext_into_dict(json_text: str) -> dict:
     """
     Convert text from JSON file into a python dict.
@@ -144,23 +689,86 @@ def read_jsontext_into_dict(json_text: str) -> dict:
         return json_dict
 
 
-def write_dict_to_jsonfile(out_dict: dict, out_path: str) -> None:
+def write_dict_to_jsonfile(
+    out_dict: dict, out_path: str, serializer: str = "indent"
+) -> None:
     """
     Write given Python dictionary to output file as JSON.
 
+    The JSON is written to a temporary file next to the output, synced to
+    disk, and renamed over the output, so a crash mid-write leaves either
+    the old or the new file in place but never a truncated one.
+
     Args:
         out_dict (dict): dictionary to write as JSON.
         out_path (str): path to write output to.
+        serializer (str): one of JSON_SERIALIZERS. "indent" writes with an
+            indentation of 4, "compact" without any whitespace, and
+            "orjson" like "compact" but using the much faster orjson.
 
     Raises:
         FileNotFoundError: no file found at given path.
+        ValueError: if the serializer is not known.
     """
-    mk_json_outpath(out_path)
+    json_text = _serialize_json(out_dict, serializer)
+
+    out_dir = os.path.dirname(out_path)
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    # keep the extension so that the temporary file is compressed alike
+    root, extension = os.path.splitext(out_path)
+    tmp_path = f"{root}.{os.getpid()}.tmp{extension}"
 
     try:
-        with open(out_path, "w", encoding="UTF-8") as json_outfile:
-            json.dump(out_dict, json_outfile, ensure_ascii=False, indent=4)
+        with open_text_file(tmp_path, "w") as json_outfile:
+            json_outfile.write(json_text)
+
+        _fsync_path(tmp_path)
+        os.replace(tmp_path, out_path)
 
     except FileNotFoundError:
         print(f"\nFile at {out_path} not found!")
         sys.exit(1)
+
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # make the rename itself durable
+    if os.name == "posix":
+        _fsync_path(out_dir or ".")
+
+
+def _serialize_json(out_dict: dict, serializer: str) -> str:
+    if serializer == "indent":
+        return json.dumps(out_dict, ensure_ascii=False, indent=4)
+
+    if serializer == "compact":
+        return json.dumps(out_dict, ensure_ascii=False, separators=(",", ":"))
+
+    if serializer == "orjson":
+        if orjson is None:
+            print("\nThe orjson serializer requires orjson to be installed!")
+            sys.exit(1)
+
+        # int keys are written as strings, as by the json module
+        return orjson.dumps(
+            out_dict, option=orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+
+    raise ValueError(f'Unknown JSON serializer "{serializer}"')
+
+
+def _fsync_path(path: str) -> None:
+    # directories can only be opened read-only; files must be writable to
+    # be synced on some platforms
+    flags = os.O_RDONLY if os.path.isdir(path) else os.O_RDWR
+    fd = os.open(path, flags)
+
+    try:
+        os.fsync(fd)
+
+    finally:
+        os.close(fd)
@@ -0,0 +1,162 @@
+"""
+Filters that select which issues are exported.
+
+Filters are given as cfg["filters"], e.g.
+
+    "filters": {
+        "issue_num": [100, 200],
+        "is_pr": true,
+        "state": ["closed", "merged"],
+        "created_at": ["2022-01-01", "2022-02-01"],
+        "closed_at": [null, "2022-06-01"]
+    }
+
+    - "issue_num" is an inclusive range of issue numbers.
+    - "created_at" and "closed_at" are windows [start, end) of ISO 8601
+      dates or datetimes. Issues without the date, e.g. open issues for
+      "closed_at", are rejected.
+    - either end of a range or window may be null to leave it open.
+
+Issue dates are read with datetime.fromisoformat unless a strptime format
+is given as "date_format". Issues with dates that cannot be read are
+reported and rejected.
+"""
+
+from datetime import datetime, timezone
+import sys
+
+
+def compile_filters(filters: dict) -> tuple:
+    """
+    Compile filters into predicates on issue numbers and issue fields.
+
+    The predicates are split so that issue numbers are checked before any
+    of an issue's fields; see filter_items.
+
+    Args:
+        filters (dict): user-given filters; see module docstring
+
+    Raises:
+        ValueError: if a filter is not known or is given an invalid value
+
+    Returns:
+        tuple: key filter and field filter. Each is None if no filter of
+        its kind is given.
+    """
+    filters = dict(filters)
+    date_format = filters.pop("date_format", None)
+
+    key_filter = None
+    field_preds: list = []
+
+    for name, arg in filters.items():
+        if arg is None:
+            continue
+
+        if name == "issue_num":
+            key_filter = _issue_num_filter(*arg)
+
+        elif name == "is_pr":
+            if not isinstance(arg, bool):
+                raise ValueError('Filter "is_pr" must be true or false')
+
+            field_preds.append(
+                lambda fields, is_pr=arg: fields.get("is_pr") is is_pr
+            )
+
+        elif name == "state":
+            states = frozenset([arg] if isinstance(arg, str) else arg)
+
+            field_preds.append(
+                lambda fields, states=states: fields.get("state") in states
+            )
+
+        elif name in ("created_at", "closed_at"):
+            field_preds.append(_date_filter(name, *arg, date_format))
+
+        else:
+            raise ValueError(f'Unknown filter "{name}"')
+
+    if not field_preds:
+        return key_filter, None
+
+    def field_filter(fields: dict) -> bool:
+        return all(pred(fields) for pred in field_preds)
+
+    return key_filter, field_filter
+
+
+def filter_items(items, key_filter, field_filter):
+    """
+    Apply compiled filters to decoded (issue number, issue data) pairs.
+
+    Args:
+        items (Iterable[tuple]): (issue number, issue data) pairs. Any
+            further elements of each item are passed through.
+        key_filter (Callable[[str], bool] | None): see compile_filters
+        field_filter (Callable[[dict], bool] | None): see compile_filters
+
+    Returns:
+        Iterator[tuple]: items that pass both filters
+    """
+    for item in items:
+        if key_filter is not None and not key_filter(item[0]):
+            continue
+
+        if field_filter is not None and not field_filter(item[1]):
+            continue
+
+        yield item
+
+
+def _issue_num_filter(low, high):
+    def key_filter(key: str) -> bool:
+        try:
+            num = int(key)
+
+        except ValueError:
+            return False
+
+        return (low is None or low <= num) and (high is None or num <= high)
+
+    return key_filter
+
+
+def _parse_date(text: str, date_format):
+    if date_format is None:
+        date = datetime.fromisoformat(text)
+
+    else:
+        date = datetime.strptime(text, date_format)
+
+    # compare timezone-aware dates in UTC
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return date
+
+
+def _date_filter(field: str, start, end, date_format):
+    # window bounds are always ISO 8601
+    start = None if start is None else _parse_date(start, None)
+    end = None if end is None else _parse_date(end, None)
+
+    def pred(fields: dict) -> bool:
+        text = fields.get(field)
+
+        if not text:
+            return False
+
+        try:
+            date = _parse_date(text, date_format)
+
+        except (TypeError, ValueError):
+            print(
+                f'\nIssue with unreadable {field} "{text}" skipped',
+                file=sys.stderr,
+            )
+            return False
+
+        return (start is None or start <= date) and (end is None or date < end)
+
+    return pred
@@ -0,0 +1,229 @@
+"""
+Incremental re-export of CSV outputs.
+
+Each output CSV gets a sidecar manifest that maps every issue number to a
+hash of its source data and to the byte range of its row in the CSV. On a
+rerun, rows of unchanged issues are reused from the existing CSV and only
+new or changed issues are encoded again.
+
+hashlib docs:
+    https://docs.python.org/3/library/hashlib.html
+"""
+
+import hashlib
+import json
+import os
+
+from src import file_io_utils as io
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def hash_issue(issue_text: str) -> str:
+    """
+    Hash the source data of an issue.
+
+    The JSON text of the issue is hashed as read, so that unchanged issues
+    never have to be encoded again to be recognized. Reformatting the input
+    makes every issue count as changed.
+
+    Args:
+        issue_text (str): JSON text of an issue; see
+            file_io_utils.iter_jsonfile_members
+
+    Returns:
+        str: hex digest of the text
+    """
+    digest = hashlib.blake2b(issue_text.encode("utf-8"), digest_size=16)
+
+    return digest.hexdigest()
+
+
+class IncrementalCSVWriter:
+    """
+    Write an output CSV, reusing rows of an earlier export where possible.
+
+    Rows must be written in input order. While the input matches the
+    beginning of the previous export, nothing is written. At the first
+    new, changed, or reordered issue:
+
+        - if every previous row has been matched, new rows are appended to
+          the existing CSV in place;
+        - otherwise, the matched prefix is copied into a new file, rows of
+          unchanged issues are copied from the old CSV by byte range, and
+          the new file replaces the old one on close.
+    """
+
+    def __init__(self, out_path: str, header: bytes, settings: dict) -> None:
+        """
+        Open the previous export of the output, if any.
+
+        Args:
+            out_path (str): path to the output CSV
+            header (bytes): encoded header row of the output
+            settings (dict): options that affect row encoding, e.g. columns
+                and delimiter. Previous exports made with other settings are
+                discarded.
+        """
+        self.out_path = out_path
+        self.manifest_path = out_path + MANIFEST_SUFFIX
+        self.settings = settings
+        self.header_length = len(header)
+
+        old_issues = self.__read_manifest()
+        self.has_old = old_issues is not None
+        self.old_issues: dict = old_issues or {}
+        self.old_order: list = list(self.old_issues)
+        self.num_matched = 0
+
+        self.new_issues: dict = {}
+        self.num_reused = 0
+        self.num_encoded = 0
+
+        self.old_csv = None
+        self.out_csv = None
+        self.tmp_path = None
+
+        if self.has_old:
+            # the header of the old CSV is valid because the settings match
+            self.pos = self.header_length
+
+        else:
+            # nothing to reuse; write a new file from the start
+            self.pos = 0
+            self.__open_rewrite()
+            self.out_csv.write(header)
+
+    def __read_manifest(self):
+        if not (
+            os.path.exists(self.manifest_path)
+            and os.path.exists(self.out_path)
+        ):
+            return None
+
+        manifest: dict = io.read_jsonfile_into_dict(self.manifest_path)
+
+        # the CSV must be exactly as the previous export left it
+        if (
+            manifest.get("settings") != self.settings
+            or manifest.get("header_length") != self.header_length
+            or manifest.get("size") != os.path.getsize(self.out_path)
+        ):
+            return None
+
+        return manifest["issues"]
+
+    def __open_rewrite(self) -> None:
+        self.tmp_path = self.out_path + ".tmp"
+
+        if self.has_old:
+            self.old_csv = open(self.out_path, "rb")
+
+        self.out_csv = open(self.tmp_path, "wb")
+
+        if self.old_csv is not None:
+            # copy the matched prefix, including the header
+            self.__copy_old(0, self.pos)
+
+    def __open_append(self) -> None:
+        self.out_csv = open(self.out_path, "r+b")
+        self.out_csv.seek(self.pos)
+        self.out_csv.truncate()
+
+    def __copy_old(self, offset: int, length: int) -> None:
+        self.old_csv.seek(offset)
+        remaining = length
+
+        while remaining:
+            data = self.old_csv.read(min(remaining, io.STREAM_READ_SIZE))
+            self.out_csv.write(data)
+            remaining -= len(data)
+
+    def is_current(self, issue_num: str, digest: str) -> bool:
+        """
+        Check whether the previous export holds a current row for an issue.
+
+        Args:
+            issue_num (str): issue number
+            digest (str): hash of the issue's source data
+
+        Returns:
+            bool: True if the row of the issue can be reused
+        """
+        old_entry = self.old_issues.get(issue_num)
+
+        return old_entry is not None and old_entry[0] == digest
+
+    def write(self, issue_num: str, digest: str, row) -> None:
+        """
+        Write the row of an issue.
+
+        Args:
+            issue_num (str): issue number
+            digest (str): hash of the issue's source data
+            row (bytes | None): encoded row, or None to reuse the row of
+                the previous export; see is_current
+        """
+        if self.out_csv is None:
+            if (
+                row is None
+                and self.num_matched < len(self.old_order)
+                and self.old_order[self.num_matched] == issue_num
+            ):
+                # still inside the unchanged prefix of the old CSV
+                _, offset, length = self.old_issues[issue_num]
+                self.new_issues[issue_num] = [digest, offset, length]
+                self.pos = offset + length
+                self.num_matched += 1
+                self.num_reused += 1
+                return
+
+            if self.num_matched == len(self.old_order):
+                self.__open_append()
+
+            else:
+                self.__open_rewrite()
+
+        offset = self.out_csv.tell()
+
+        if row is None:
+            _, old_offset, length = self.old_issues[issue_num]
+            self.__copy_old(old_offset, length)
+            self.num_reused += 1
+
+        else:
+            self.out_csv.write(row)
+            length = len(row)
+            self.num_encoded += 1
+
+        self.new_issues[issue_num] = [digest, offset, length]
+
+    def close(self) -> None:
+        """Finish the output CSV and write its manifest."""
+        if self.out_csv is None:
+            # every row was reused in place; drop rows of removed issues
+            with open(self.out_path, "r+b") as out_csv:
+                out_csv.truncate(self.pos)
+
+        else:
+            self.out_csv.close()
+
+            if self.old_csv is not None:
+                self.old_csv.close()
+
+            if self.tmp_path is not None:
+                os.replace(self.tmp_path, self.out_path)
+
+        manifest = {
+            "settings": self.settings,
+            "header_length": self.header_length,
+            "size": os.path.getsize(self.out_path),
+            "issues": self.new_issues,
+        }
+
+        tmp_manifest_path = self.manifest_path + ".tmp"
+
+        with open(tmp_manifest_path, "w", encoding="UTF-8") as manifest_file:
+            json.dump(manifest, manifest_file, ensure_ascii=False)
+
+        os.replace(tmp_manifest_path, self.manifest_path)
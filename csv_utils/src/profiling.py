@@ -0,0 +1,198 @@
+"""
+Stage timing and memory profiling of exports.
+
+With cfg["profile"] set, an export records the time spent in and the
+number of items passed through each stage:
+
+    - read: reading, decoding, and filtering issues from the input
+    - build: assembling rows from issue data
+    - encode: encoding rows for each output, e.g. CSV text
+    - write: writing encoded rows to each output
+
+along with the peak resident memory of the main process and of its worker
+processes and, if cfg["cprofile"] is set, a cProfile dump of the main
+process. Memory is read from the operating system rather than traced, so
+measuring it does not slow down the stages being timed. Build and
+encode run in worker processes if cfg["workers"] is above 1, in which
+case their times are summed across workers and may exceed the wall time.
+In incremental mode, only reading is timed separately.
+
+The results are written as JSON next to the first output, see
+PROFILE_SUFFIX and CPROFILE_SUFFIX. When profiling is off, no stage is
+timed.
+
+cProfile docs:
+    https://docs.python.org/3/library/profile.html
+
+resource docs:
+    https://docs.python.org/3/library/resource.html
+"""
+
+import cProfile
+import sys
+import time
+from typing import Iterable, Iterator
+from src import file_io_utils as io
+
+try:
+    import resource
+
+except ImportError:
+    # not available on Windows
+    resource = None
+
+PROFILE_SUFFIX = ".profile.json"
+CPROFILE_SUFFIX = ".prof"
+
+
+def add_timing(timings: dict, stage: str, start: float, count: int) -> None:
+    """
+    Add the time since start and a count of items to a stage.
+
+    Args:
+        timings (dict): {stage: [seconds, count]} to add to
+        stage (str): name of the stage
+        start (float): time.perf_counter() at the start of the stage
+        count (int): number of items processed by the stage
+
+    Returns: None
+    """
+    stage_timing = timings.setdefault(stage, [0.0, 0])
+    stage_timing[0] += time.perf_counter() - start
+    stage_timing[1] += count
+
+
+def get_peak_rss(who: int) -> int:
+    """
+    Get the peak resident set size of this process or of its children.
+
+    Args:
+        who (int): resource.RUSAGE_SELF, or resource.RUSAGE_CHILDREN for the
+            largest of the child processes that have been waited for
+
+    Returns:
+        int: peak resident set size in bytes, over the lifetime of the
+        process
+    """
+    peak_rss = resource.getrusage(who).ru_maxrss
+
+    # reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak_rss
+
+    return peak_rss * 1024
+
+
+class ExportProfiler:
+    """Collect stage timings and memory use of one export."""
+
+    def __init__(self, out_path: str, use_cprofile: bool) -> None:
+        """
+        Start the wall clock and, optionally, cProfile.
+
+        Args:
+            out_path (str): path to the output that reports are written
+                next to
+            use_cprofile (bool): also dump cProfile statistics
+        """
+        self.out_path = out_path
+        self.report_path = out_path + PROFILE_SUFFIX
+        self.timings: dict = {}
+
+        self.cprofile = cProfile.Profile() if use_cprofile else None
+
+        self.start = time.perf_counter()
+
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    def time_iter(self, stage: str, items: Iterable) -> Iterator:
+        """
+        Time the production of each item of an iterable as a stage.
+
+        Args:
+            stage (str): name of the stage
+            items (Iterable): items to time
+
+        Returns:
+            Iterator: the same items
+        """
+        items = iter(items)
+
+        while True:
+            start = time.perf_counter()
+
+            try:
+                item = next(items)
+
+            except StopIteration:
+                add_timing(self.timings, stage, start, 0)
+                return
+
+            add_timing(self.timings, stage, start, 1)
+
+            yield item
+
+    def merge(self, timings: dict) -> None:
+        """
+        Add timings, e.g. those returned by a worker process.
+
+        Args:
+            timings (dict): {stage: [seconds, count]}
+
+        Returns: None
+        """
+        for stage, (seconds, count) in timings.items():
+            stage_timing = self.timings.setdefault(stage, [0.0, 0])
+            stage_timing[0] += seconds
+            stage_timing[1] += count
+
+    def finish(self, cfg: dict) -> None:
+        """
+        Stop profiling and write the JSON report.
+
+        Args:
+            cfg (dict): user configuration, summarized in the report
+
+        Returns: None
+        """
+        if self.cprofile is not None:
+            self.cprofile.disable()
+
+        wall_seconds = time.perf_counter() - self.start
+        peak_rss = peak_worker_rss = None
+
+        if resource is not None:
+            peak_rss = get_peak_rss(resource.RUSAGE_SELF)
+            peak_worker_rss = get_peak_rss(resource.RUSAGE_CHILDREN)
+
+        cprofile_path = None
+
+        if self.cprofile is not None:
+            cprofile_path = self.out_path + CPROFILE_SUFFIX
+            self.cprofile.dump_stats(cprofile_path)
+
+        stages = {
+            stage: {
+                "seconds": round(seconds, 6),
+                "count": count,
+                "per_second": round(count / seconds, 1) if seconds else None,
+            }
+            for stage, (seconds, count) in self.timings.items()
+        }
+
+        io.write_dict_to_jsonfile(
+            {
+                "input_json": cfg["input_json"],
+                "workers": cfg.get("workers", 1),
+                "chunk_size": cfg.get("chunk_size"),
+                "wall_seconds": round(wall_seconds, 6),
+                "peak_rss_bytes": peak_rss,
+                "peak_worker_rss_bytes": peak_worker_rss,
+                "stages": stages,
+                "cprofile_stats": cprofile_path,
+            },
+            self.report_path,
+        )
+
+        print(f'Profile written to "{self.report_path}"', file=sys.stderr)
@@ -0,0 +1,307 @@
+"""
+Output formats that rows can be written to.
+
+Every sink is split into two steps so that the expensive one can run in
+worker processes:
+
+    - encode: a static method turning a chunk of rows into an encoded
+      chunk, e.g. CSV text. It must be picklable and have no state.
+    - write: writes an encoded chunk to the output in the main process.
+
+pyarrow docs:
+    https://arrow.apache.org/docs/python/parquet.html
+"""
+
+import csv
+from io import StringIO
+import os
+import sys
+from typing import Iterable
+from src import blob_store
+from src import file_io_utils as io
+
+# maximum number of rows per Parquet row group
+DEFAULT_ROW_GROUP_SIZE = 100_000
+
+# rows buffered for a Parquet row group are written out once they take up
+# this many bytes, even if the row group is not full
+DEFAULT_ROW_GROUP_BYTES = 32 << 20
+
+# types of typed output columns; all other columns are strings
+COLUMN_TYPES: dict = {
+    "Additions": "int64",
+    "Changes": "int64",
+    "Deletions": "int64",
+    "File_Names": "list<string>",
+    "isPR": "bool",
+    "Issue_Author_ID": "int64",
+    "Issue_Num": "int64",
+    "Num_Changed_Files": "int64",
+    "Num_Comments": "int64",
+    "Num_Commits": "int64",
+    "Num_Review_Comments": "int64",
+    "PR_Author_Name": "int64",
+}
+
+
+def encode_csv_rows(rows: Iterable[list], delimiter: str) -> str:
+    """
+    Encode rows as CSV text.
+
+    Args:
+        rows (Iterable[list]): lists of row data to encode
+        delimiter (str): CSV column delimiter
+
+    Returns:
+        str: CSV text of the given rows
+    """
+    out_text = StringIO(newline="")
+
+    writer = csv.writer(
+        out_text,
+        quoting=csv.QUOTE_MINIMAL,
+        delimiter=delimiter,
+        quotechar='"',
+        # escapechar="",
+    )
+
+    writer.writerows(rows)
+
+    return out_text.getvalue()
+
+
+class CSVSink:
+    """
+    Write rows to a CSV file, optionally gzip or zstd compressed.
+
+    If cfg["spill_threshold"] is set, longer fields are written to a
+    sidecar blob file and referenced from the CSV; see src/blob_store.py.
+    """
+
+    def __init__(self, out_path: str, columns: list, cfg: dict) -> None:
+        """
+        Open the output CSV and write its header.
+
+        Args:
+            out_path (str): path to the output CSV
+            columns (list): column names of the output
+            cfg (dict): user configuration
+        """
+        self.out_path = out_path
+        self.blob_writer = None
+
+        if cfg.get("spill_threshold") is not None:
+            self.blob_writer = blob_store.BlobWriter(
+                out_path + blob_store.BLOB_FILE_SUFFIX
+            )
+
+        # compressed by extension, e.g. "out.csv.gz"; see open_text_file
+        self.out_file = io.open_text_file(out_path, "w", newline="")
+        self.out_file.write(encode_csv_rows([columns], cfg["delimiter"]))
+
+    @staticmethod
+    def encode(rows: list, columns: list, cfg: dict) -> tuple:
+        """
+        Encode a chunk of rows as CSV text.
+
+        Args:
+            rows (list): lists of row data, ordered by columns
+            columns (list): column names of the output
+            cfg (dict): user configuration
+
+        Returns:
+            tuple: pieces of the CSV text of the rows, and {hash: UTF-8
+            bytes} of the fields spilled out of them; see
+            blob_store.encode_spilled_rows
+        """
+        threshold = cfg.get("spill_threshold")
+
+        if threshold is not None:
+            return blob_store.encode_spilled_rows(
+                rows, threshold, cfg["delimiter"], encode_csv_rows
+            )
+
+        return [encode_csv_rows(rows, cfg["delimiter"])], {}
+
+    def write(self, encoded: tuple) -> None:
+        """
+        Write and flush a chunk of CSV text.
+
+        Args:
+            encoded (tuple): encoded chunk from CSVSink.encode
+        """
+        pieces, blobs = encoded
+
+        if self.blob_writer is not None:
+            text = self.blob_writer.join_pieces(pieces, blobs)
+
+        else:
+            text = "".join(pieces)
+
+        self.out_file.write(text)
+        self.out_file.flush()
+
+    def close(self) -> None:
+        """Close the output CSV and its blob file."""
+        self.out_file.close()
+
+        if self.blob_writer is not None:
+            self.blob_writer.close()
+
+
+class ParquetSink:
+    """
+    Write rows to a Parquet file with a typed, compressed schema.
+
+    The schema is derived from the output's columns and COLUMN_TYPES. Empty
+    values in typed columns, e.g. the commit columns of issues that are not
+    PRs, are written as nulls. Rows are buffered into row groups of up to
+    cfg["row_group_size"] rows and cfg["row_group_bytes"] bytes, so large
+    fields, e.g. patches, cannot grow the buffer without bound.
+    """
+
+    def __init__(self, out_path: str, columns: list, cfg: dict) -> None:
+        """
+        Open the output Parquet file.
+
+        Args:
+            out_path (str): path to the output file
+            columns (list): column names of the output
+            cfg (dict): user configuration
+
+        Raises:
+            ImportError: hard exit if pyarrow is not installed.
+        """
+        # imported here rather than with the module, since importing
+        # pyarrow takes longer than many CSV exports
+        try:
+            import pyarrow
+            import pyarrow.parquet
+
+        except ImportError:
+            print("\nWriting Parquet output requires pyarrow to be installed!")
+            sys.exit(1)
+
+        self.pyarrow = pyarrow
+        self.out_path = out_path
+        self.row_group_size: int = cfg.get(
+            "row_group_size", DEFAULT_ROW_GROUP_SIZE
+        )
+        self.row_group_bytes: int = cfg.get(
+            "row_group_bytes", DEFAULT_ROW_GROUP_BYTES
+        )
+
+        self.schema = pyarrow.schema(
+            [(col, _get_arrow_type(pyarrow, col)) for col in columns]
+        )
+
+        self.writer = pyarrow.parquet.ParquetWriter(
+            out_path,
+            self.schema,
+            compression=cfg.get("parquet_compression", "zstd"),
+        )
+
+        self.batches: list = []
+        self.num_buffered = 0
+        self.num_buffered_bytes = 0
+
+    @staticmethod
+    def encode(rows: list, columns: list, cfg: dict) -> dict:
+        """
+        Convert a chunk of rows into typed columns.
+
+        Args:
+            rows (list): lists of row data, ordered by columns
+            columns (list): column names of the output
+            cfg (dict): user configuration
+
+        Returns:
+            dict: {column name: list of typed column values}
+        """
+        return {
+            col: [
+                _convert_value(row[i], COLUMN_TYPES.get(col, "string"))
+                for row in rows
+            ]
+            for i, col in enumerate(columns)
+        }
+
+    def write(self, col_data: dict) -> None:
+        """
+        Buffer a chunk of columns, writing a row group once it is full.
+
+        Args:
+            col_data (dict): encoded chunk from ParquetSink.encode
+        """
+        batch = self.pyarrow.RecordBatch.from_pydict(
+            col_data, schema=self.schema
+        )
+
+        self.batches.append(batch)
+        self.num_buffered += batch.num_rows
+        self.num_buffered_bytes += batch.nbytes
+
+        if (
+            self.num_buffered >= self.row_group_size
+            or self.num_buffered_bytes >= self.row_group_bytes
+        ):
+            self.__flush()
+
+    def __flush(self) -> None:
+        if self.batches:
+            self.writer.write_table(
+                self.pyarrow.Table.from_batches(
+                    self.batches, schema=self.schema
+                ),
+                row_group_size=self.row_group_size,
+            )
+
+        self.batches = []
+        self.num_buffered = 0
+        self.num_buffered_bytes = 0
+
+    def close(self) -> None:
+        """Write any buffered rows and close the output file."""
+        self.__flush()
+        self.writer.close()
+
+
+# output formats by file extension; anything else is written as CSV
+SINK_TYPES: dict = {
+    ".parquet": ParquetSink,
+}
+
+
+def get_sink_type(out_path: str):
+    """
+    Get the sink that writes the format of the given output path.
+
+    Args:
+        out_path (str): path to the output file
+
+    Returns:
+        type: CSVSink, or the entry of SINK_TYPES for the path's extension
+    """
+    extension = os.path.splitext(out_path)[1].lower()
+
+    return SINK_TYPES.get(extension, CSVSink)
+
+
+def _get_arrow_type(pyarrow, col: str):
+    col_type = COLUMN_TYPES.get(col, "string")
+
+    if col_type == "list<string>":
+        return pyarrow.list_(pyarrow.string())
+
+    return pyarrow.type_for_alias(col_type)
+
+
+def _convert_value(value, col_type: str):
+    # rows use "" for values that do not apply to an issue
+    if value == "" and col_type != "string":
+        return None
+
+    if col_type == "int64" and value is not None:
+        return int(value)
+
+    return value
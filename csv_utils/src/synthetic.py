@@ -0,0 +1,140 @@
+"""
+Seeded generator of synthetic extractor output.
+
+Issues are shaped like the JSON written by the extractor, with the fields
+read by csv_driver.py. The same arguments always generate the same file,
+so generated inputs can be used to compare runs across changes.
+"""
+
+import json
+import random
+from typing import Iterator
+from src import file_io_utils as io
+
+LOGINS = tuple(f"user{i}" for i in range(200))
+STATES = ("closed", "merged", "open")
+FILE_NAMES = tuple(
+    f"src/{pkg}/{mod}.py"
+    for pkg in ("core", "gui", "logic", "model")
+    for mod in ("main", "utils", "io", "search", "prefs")
+)
+WORDS = (
+    "the fix for this issue changes how entries are parsed and saved when"
+    " the user opens a library with many groups and linked files"
+).split()
+
+
+def generate_issues(
+    num_issues: int,
+    seed: int = 0,
+    num_comments: int = 3,
+    num_commits: int = 3,
+    patch_lines: int = 40,
+    pr_ratio: float = 0.6,
+) -> Iterator[tuple]:
+    """
+    Lazily generate synthetic issues.
+
+    Args:
+        num_issues (int): number of issues to generate
+        seed (int): seed of the random generator
+        num_comments (int): maximum number of comments per issue
+        num_commits (int): maximum number of commits per PR
+        patch_lines (int): maximum number of lines in each commit's patch
+        pr_ratio (float): fraction of issues that are PRs
+
+    Returns:
+        Iterator[tuple]: (issue number, issue data) pairs
+    """
+    rng = random.Random(seed)
+
+    for num in range(1, num_issues + 1):
+        login = rng.choice(LOGINS)
+        comments = {
+            str(rng.randrange(10**9)): {
+                "body": _sentence(rng, 30),
+                "userid": rng.randrange(10**6),
+                "userlogin": rng.choice(LOGINS),
+            }
+            for _ in range(rng.randint(0, num_comments))
+        }
+
+        issue = {
+            "body": _sentence(rng, 200),
+            "closed_at": _date(rng, 2022),
+            "comments": comments,
+            "created_at": _date(rng, 2021),
+            "is_pr": rng.random() < pr_ratio,
+            "num_comments": len(comments),
+            "title": _sentence(rng, 10),
+            "userid": LOGINS.index(login),
+            "userlogin": login,
+        }
+
+        if issue["is_pr"]:
+            issue["num_review_comments"] = rng.randint(0, 5)
+            issue["state"] = rng.choice(STATES)
+            issue["commits"] = {
+                str(i): _commit(rng, patch_lines)
+                for i in range(rng.randint(0, num_commits))
+            }
+
+        yield str(num), issue
+
+
+def write_synthetic_jsonfile(out_path: str, num_issues: int, **kwargs) -> None:
+    """
+    Write synthetic issues to a JSON file, one issue at a time.
+
+    Args:
+        out_path (str): path to write to; compressed by its extension
+        num_issues (int): number of issues to generate
+        **kwargs: options of generate_issues
+
+    Returns: None
+    """
+    with io.open_text_file(out_path, "w") as out_file:
+        out_file.write("{")
+
+        for i, (num, issue) in enumerate(
+            generate_issues(num_issues, **kwargs)
+        ):
+            out_file.write(",\n" if i else "\n")
+            out_file.write(f"{json.dumps(num)}: ")
+            json.dump(issue, out_file, ensure_ascii=False)
+
+        out_file.write("\n}\n")
+
+
+def _sentence(rng: random.Random, max_words: int) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(0, max_words)))
+
+
+def _date(rng: random.Random, year: int) -> str:
+    return (
+        f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        f"T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z"
+    )
+
+
+def _commit(rng: random.Random, patch_lines: int) -> dict:
+    file_list = rng.sample(FILE_NAMES, rng.randint(1, 4))
+    additions = rng.randint(0, 200)
+    removals = rng.randint(0, 200)
+
+    return {
+        "author_name": rng.choice(LOGINS),
+        "date": _date(rng, 2022),
+        "files": {
+            "additions": additions,
+            "changes": additions + removals,
+            "file_list": file_list,
+            "patch_text": "\n".join(
+                f"{rng.choice('+- ')}{_sentence(rng, 12)}"
+                for _ in range(rng.randint(1, patch_lines))
+            ),
+            "removals": removals,
+        },
+        "message": _sentence(rng, 20),
+        "sha": f"{rng.getrandbits(160):040x}",
+    }
@@ -0,0 +1,309 @@
+"""
+Validation of extractor records.
+
+Each output is compiled into a validator that checks only the fields its
+columns read, so validation runs alongside row building in the same pass
+over each issue. Issues that fail validation are left out of the outputs
+whose validators they fail and collected in a quarantine file.
+"""
+
+from collections import Counter
+import itertools
+import json
+import sys
+
+NoneType = type(None)
+
+# expected types of the fields of an issue
+ISSUE_FIELD_TYPES: dict = {
+    "body": (str, NoneType),
+    "closed_at": (str, NoneType),
+    "comments": dict,
+    "created_at": (str, NoneType),
+    "is_pr": bool,
+    "num_comments": int,
+    "title": (str, NoneType),
+    "userid": int,
+    "userlogin": str,
+}
+
+# expected types of the fields of a PR, checked only if "is_pr" is true
+PR_FIELD_TYPES: dict = {
+    "num_review_comments": int,
+    "state": str,
+}
+
+# expected types of the fields of the last commit of a PR, and of its
+# "files", checked only if the PR has commits
+COMMIT_FIELD_TYPES: dict = {
+    "author_name": (str, NoneType),
+    "date": (str, NoneType),
+    "files": dict,
+    "message": (str, NoneType),
+    "sha": str,
+}
+
+COMMIT_FILE_FIELD_TYPES: dict = {
+    "additions": int,
+    "changes": int,
+    "file_list": list,
+    "patch_text": (str, NoneType),
+    "removals": int,
+}
+
+# fields read by each column, besides "is_pr", which is always read
+COLUMN_FIELDS: dict = {
+    "Author_Login": (),
+    "Committer login": (),
+    "Issue_Num": (),
+    "Issue_Author_ID": ("userid",),
+    "Issue_Author_Login": ("userlogin",),
+    "Issue_Body": ("body",),
+    "Issue_Closed_Date": ("closed_at",),
+    "Issue_Comments": ("comments",),
+    "Issue_Created_Date": ("created_at",),
+    "Issue_Title": ("title",),
+    "isPR": (),
+    "Num_Comments": ("num_comments",),
+    "Num_Review_Comments": ("num_review_comments",),
+    "PR_Author_Login": ("userlogin",),
+    "PR_Author_Name": ("userid",),
+    "PR_Body": ("body",),
+    "PR_Closed_Date": ("closed_at",),
+    "PR_Title": ("title",),
+    "PR_Comments": ("comments",),
+    "Status": ("state",),
+}
+
+_MISSING = object()
+
+
+def compile_validator(columns: list, all_commits: bool = False):
+    """
+    Compile a validator for the fields read by the given columns.
+
+    Columns that are not in COLUMN_FIELDS are commit columns, which read
+    every field of the last commit.
+
+    Args:
+        columns (list): column names of the output
+        all_commits (bool): check every commit rather than only the last
+            one, for outputs with a row per commit
+
+    Returns:
+        Callable[[dict], list]: function of issue data that returns the
+        validation errors of the issue, e.g. ["userid: missing"]. Empty if
+        the issue is valid.
+    """
+    fields, check_commits = _get_checked_fields(columns)
+
+    issue_checks = [
+        (field, types)
+        for field, types in ISSUE_FIELD_TYPES.items()
+        if field in fields
+    ]
+
+    pr_checks = [
+        (field, types)
+        for field, types in PR_FIELD_TYPES.items()
+        if field in fields
+    ]
+
+    commit_checks = list(COMMIT_FIELD_TYPES.items())
+    file_checks = list(COMMIT_FILE_FIELD_TYPES.items())
+
+    def validate(issue_data: dict) -> list:
+        if not isinstance(issue_data, dict):
+            return [_describe_error("issue", issue_data, dict)]
+
+        errors = _check_fields(issue_data, issue_checks, "")
+
+        if issue_data.get("is_pr") is not True:
+            return errors
+
+        errors += _check_fields(issue_data, pr_checks, "")
+
+        if not check_commits:
+            return errors
+
+        # PRs without commits have empty commit columns
+        commits = issue_data.get("commits", {})
+
+        if not isinstance(commits, dict):
+            errors.append(_describe_error("commits", commits, dict))
+
+        elif all_commits:
+            for commit in commits.values():
+                errors += _check_commit(
+                    commit, commit_checks, file_checks, "commits[*]"
+                )
+
+        elif commits:
+            errors += _check_commit(
+                next(reversed(commits.values())),
+                commit_checks,
+                file_checks,
+                "commits[-1]",
+            )
+
+        return errors
+
+    return validate
+
+
+def compile_output_validators(columns_list: list, all_commits: bool = False):
+    """
+    Compile a validator for each of several outputs.
+
+    Outputs that read the same fields share a validator, which runs once
+    per issue.
+
+    Args:
+        columns_list (list): column names of each output
+        all_commits (bool): see compile_validator
+
+    Returns:
+        Callable[[dict], list]: function of issue data that returns the
+        validation errors of the issue for each output, in the order of
+        columns_list
+    """
+    validators: dict = {}
+    out_keys: list = []
+
+    for columns in columns_list:
+        key = _get_checked_fields(columns)
+        out_keys.append(key)
+
+        if key not in validators:
+            validators[key] = compile_validator(columns, all_commits)
+
+    def validate_outputs(issue_data: dict) -> list:
+        errors = {
+            key: validate(issue_data) for key, validate in validators.items()
+        }
+
+        return [errors[key] for key in out_keys]
+
+    return validate_outputs
+
+
+def _get_checked_fields(columns: list) -> tuple:
+    fields = {"is_pr"}
+    check_commits = False
+
+    for col in columns:
+        if col in COLUMN_FIELDS:
+            fields.update(COLUMN_FIELDS[col])
+
+        else:
+            check_commits = True
+
+    return frozenset(fields), check_commits
+
+
+def _check_commit(
+    commit, commit_checks: list, file_checks: list, prefix: str
+) -> list:
+    if not isinstance(commit, dict):
+        return [_describe_error(prefix, commit, dict)]
+
+    errors = _check_fields(commit, commit_checks, prefix + ".")
+    files = commit.get("files")
+
+    if isinstance(files, dict):
+        errors += _check_fields(files, file_checks, prefix + ".files.")
+
+    return errors
+
+
+def _check_fields(data: dict, checks: list, prefix: str) -> list:
+    return [
+        _describe_error(prefix + field, data.get(field, _MISSING), types)
+        for field, types in checks
+        if not isinstance(data.get(field, _MISSING), types)
+    ]
+
+
+def _describe_error(field: str, value, types) -> str:
+    if value is _MISSING:
+        return f"{field}: missing"
+
+    if not isinstance(types, tuple):
+        types = (types,)
+
+    expected = " or ".join(
+        "null" if item is NoneType else item.__name__ for item in types
+    )
+
+    return f"{field}: expected {expected}, got {type(value).__name__}"
+
+
+class ValidationReport:
+    """Count validation errors and quarantine invalid issues."""
+
+    def __init__(self, quarantine_path: str, out_paths: list) -> None:
+        """
+        Open the quarantine file.
+
+        Args:
+            quarantine_path (str): path to the JSON Lines file that invalid
+                issues are written to, one {"issue_num", "errors",
+                "outputs", "data"} object per line, where "outputs" lists
+                the outputs the issue was left out of
+            out_paths (list): path of each output
+        """
+        self.quarantine_path = quarantine_path
+        self.out_paths = out_paths
+        self.quarantine_file = open(quarantine_path, "w", encoding="UTF-8")
+
+        self.num_invalid = 0
+        self.error_counts: Counter = Counter()
+
+    def add(self, invalid: list) -> None:
+        """
+        Record invalid issues.
+
+        Args:
+            invalid (list): (issue number, errors, issue data) of each
+                invalid issue, where errors holds the errors of the issue
+                for each output; see compile_output_validators
+        """
+        for issue_num, out_errors, issue_data in invalid:
+            errors = list(dict.fromkeys(itertools.chain(*out_errors)))
+            out_paths = [
+                out_path
+                for out_path, issue_errors in zip(self.out_paths, out_errors)
+                if issue_errors
+            ]
+
+            self.num_invalid += 1
+            self.error_counts.update(errors)
+
+            json.dump(
+                {
+                    "issue_num": issue_num,
+                    "errors": errors,
+                    "outputs": out_paths,
+                    "data": issue_data,
+                },
+                self.quarantine_file,
+                ensure_ascii=False,
+            )
+            self.quarantine_file.write("\n")
+
+    def close(self) -> None:
+        """Close the quarantine file and print a summary of the errors."""
+        self.quarantine_file.close()
+
+        if not self.num_invalid:
+            print("Validation: all issues valid", file=sys.stderr)
+            return
+
+        print(
+            f"Validation: {self.num_invalid} issues left out of one or more"
+            f' outputs and written to "{self.quarantine_path}"',
+            file=sys.stderr,
+        )
+
+        for error, count in self.error_counts.most_common():
+            print(f"    {count:>10}  {error}", file=sys.stderr)
@@ -0,0 +1,8 @@
+"""Make the modules of csv_utils importable as they are by its scripts."""
+
+import os
+import sys
+
+CSV_UTILS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, CSV_UTILS_DIR)
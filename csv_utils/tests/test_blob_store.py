@@ -0,0 +1,110 @@
+"""Tests of spilling large CSV fields in src/blob_store.py."""
+
+import csv
+import pytest
+from src import blob_store
+from src import sinks
+
+COLUMNS = ["a", "b", "c"]
+
+ROWS = [
+    ["1", "short", None],
+    ["2", "x" * 40, ""],
+    ["3", "@blob:0:5", "@blob:0:5" + "y" * 40],
+    ["4", "@@blob:0:5", "@@blob:12:3"],
+    ["5", "multi\nline, \"quoted\"", "multi\r\nline\n" * 10],
+    ["6", "x" * 40, "é ü 中文 😀" * 10],
+    [7, 8, None],
+    ["@blob:", "@", "@@"],
+    ["", "", ""],
+]
+
+# rows of a single field, whose encoding differs from that of longer rows
+SINGLE_FIELD_ROWS = [
+    [None],
+    [""],
+    ["short"],
+    ["x" * 40],
+    ["@blob:1:1"],
+    ["@@blob:1:1"],
+    ["line\n" * 20],
+]
+
+
+def write_csv(out_path, columns: list, rows: list, cfg: dict) -> None:
+    sink = sinks.CSVSink(str(out_path), columns, cfg)
+    sink.write(sinks.CSVSink.encode(rows, columns, cfg))
+    sink.close()
+
+
+def read_csv(in_path) -> list:
+    with open(in_path, encoding="UTF-8", newline="") as in_file:
+        return list(csv.reader(in_file))
+
+
+@pytest.mark.parametrize("threshold", [0, 5, 30])
+@pytest.mark.parametrize(
+    "columns, rows", [(COLUMNS, ROWS), (["a"], SINGLE_FIELD_ROWS)]
+)
+def test_spilled_fields_resolve_to_written_fields(
+    tmp_path, threshold, columns, rows
+):
+    cfg = {"delimiter": ","}
+    write_csv(tmp_path / "plain.csv", columns, rows, cfg)
+    write_csv(
+        tmp_path / "spilled.csv",
+        columns,
+        rows,
+        {**cfg, "spill_threshold": threshold},
+    )
+
+    spilled_rows = read_csv(tmp_path / "spilled.csv")
+    blob_path = str(tmp_path / "spilled.csv") + blob_store.BLOB_FILE_SUFFIX
+
+    with blob_store.BlobReader(blob_path) as blobs:
+        resolved = [
+            [blobs.resolve(cell) for cell in row] for row in spilled_rows
+        ]
+
+    assert resolved == read_csv(tmp_path / "plain.csv")
+
+    # every field longer than threshold was spilled
+    for row, spilled_row in zip(rows, spilled_rows[1:]):
+        for val, cell in zip(row, spilled_row):
+            if isinstance(val, str) and len(val) > threshold:
+                assert cell.startswith(blob_store.BLOB_REF_PREFIX)
+
+
+def test_spilled_rows_are_encoded_like_other_rows(tmp_path):
+    rows = [["", "x" * 12, None], ["@blob:0:1", "y" * 12, "a,b"]]
+    cfg = {"delimiter": ",", "spill_threshold": 10}
+    write_csv(tmp_path / "out.csv", COLUMNS, rows, cfg)
+
+    assert (tmp_path / "out.csv").read_bytes() == (
+        b'a,b,c\r\n,@blob:0:12,\r\n@@blob:0:1,@blob:12:12,"a,b"\r\n'
+    )
+
+
+def test_identical_fields_are_stored_once(tmp_path):
+    rows = [["x" * 40, "x" * 40], ["y" * 40, "x" * 40]]
+    cfg = {"delimiter": ",", "spill_threshold": 10}
+    write_csv(tmp_path / "out.csv", ["a", "b"], rows, cfg)
+
+    cells = [
+        cell for row in read_csv(tmp_path / "out.csv")[1:] for cell in row
+    ]
+
+    assert len(set(cells)) == 2
+    assert (tmp_path / "out.csv.blobs").stat().st_size == 80
+
+
+def test_resolve_leaves_other_cells_alone(tmp_path):
+    blob_path = tmp_path / "empty.blobs"
+    blob_path.write_bytes(b"")
+
+    with blob_store.BlobReader(str(blob_path)) as blobs:
+        for cell in ["", "@", "@blob", "@blob:1", "@blob:1:2x", "a@blob:1:2"]:
+            assert blobs.resolve(cell) == cell
+
+        assert blobs.resolve("@@blob:1:2") == "@blob:1:2"
+        assert blobs.resolve("@@@blob:") == "@@blob:"
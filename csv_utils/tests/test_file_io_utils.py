@@ -0,0 +1,112 @@
+"""Tests of streaming JSON input in src/file_io_utils.py."""
+
+import gzip
+import json
+import pytest
+from src import file_io_utils as io
+from src import synthetic
+
+# top-level objects with escapes, nesting, numbers, and whitespace that may
+# be cut at any point by a buffer boundary
+DOCUMENTS = [
+    "{}",
+    " \n{ }\n",
+    '{"a": 1}',
+    '{"1": {"body": "say \\"hi\\" \\\\ {not} [an] object", "n": -12.5e3}}',
+    '{"\\u00e9": "\\u00e9\\ud83d\\ude00\\n", "b": [1, [2, {"c": null}]],'
+    ' "t": true, "f": false}',
+    '{"big": 123456789012345678901234567890, "s": "x}", "e": {}, "l": []}',
+    '{\n\t"k" : {"deep": [{"a": "b\\\\"}, "]"]} ,\r\n "k2": "}\\"{\\\\"}',
+    '{"1": {"s": "é ü 中文 😀", "n": 0.000001}, "2": 7}',
+]
+
+# sizes of each read of the stream, down to a single character
+READ_SIZES = [1, 2, 3, 7, 64, 1 << 20]
+
+
+def write_text(path, text: str) -> str:
+    with open(path, "w", encoding="UTF-8") as out_file:
+        out_file.write(text)
+
+    return str(path)
+
+
+@pytest.fixture(params=READ_SIZES)
+def read_size(request, monkeypatch) -> int:
+    monkeypatch.setattr(io, "STREAM_READ_SIZE", request.param)
+
+    return request.param
+
+
+@pytest.mark.parametrize("doc", DOCUMENTS)
+def test_iter_jsonfile_items_matches_json_loads(tmp_path, read_size, doc):
+    in_path = write_text(tmp_path / "in.json", doc)
+
+    assert list(io.iter_jsonfile_items(in_path)) == list(
+        json.loads(doc).items()
+    )
+
+
+def test_iter_jsonfile_items_reads_synthetic_input(tmp_path, read_size):
+    in_path = str(tmp_path / "in.json")
+    synthetic.write_synthetic_jsonfile(in_path, 30, seed=1, patch_lines=5)
+
+    with open(in_path, encoding="UTF-8") as in_file:
+        expected = list(json.load(in_file).items())
+
+    assert list(io.iter_jsonfile_items(in_path)) == expected
+
+
+def test_iter_jsonfile_items_reads_gzip(tmp_path, read_size):
+    in_path = str(tmp_path / "in.json.gz")
+
+    with gzip.open(in_path, "wt", encoding="UTF-8") as out_file:
+        out_file.write(DOCUMENTS[4])
+
+    assert list(io.iter_jsonfile_items(in_path)) == list(
+        json.loads(DOCUMENTS[4]).items()
+    )
+
+
+@pytest.mark.parametrize("doc", DOCUMENTS)
+def test_iter_jsonfile_members_text(tmp_path, read_size, doc):
+    in_path = write_text(tmp_path / "in.json", doc)
+
+    for _, value, text in io.iter_jsonfile_members(in_path):
+        assert text in doc and text == text.strip()
+        assert json.loads(text) == value
+
+    assert [key for key, _, _ in io.iter_jsonfile_members(in_path)] == list(
+        json.loads(doc)
+    )
+
+
+def test_iter_jsonfile_items_empty_file(tmp_path):
+    in_path = write_text(tmp_path / "in.json", "")
+
+    assert not list(io.iter_jsonfile_items(in_path))
+
+
+@pytest.mark.parametrize("doc", ['{"a": 1,}', '{"a" 1}', '{"a": [1}', "[]"])
+def test_iter_jsonfile_items_rejects_invalid_json(tmp_path, read_size, doc):
+    in_path = write_text(tmp_path / "in.json", doc)
+
+    with pytest.raises(json.JSONDecodeError):
+        list(io.iter_jsonfile_items(in_path))
+
+
+def test_iter_indexed_jsonfile_items(tmp_path):
+    in_path = write_text(tmp_path / "in.json", DOCUMENTS[7])
+    issues = json.loads(DOCUMENTS[7])
+
+    assert list(io.iter_indexed_jsonfile_items(in_path, ["2", "x", "1"])) == [
+        ("1", issues["1"]),
+        ("2", issues["2"]),
+    ]
+
+    # spans are byte offsets, even after multi-byte characters
+    with open(in_path, "rb") as in_file:
+        data = in_file.read()
+
+    for key, (start, end) in io.read_jsonfile_index(in_path).items():
+        assert json.loads(data[start:end]) == issues[key]
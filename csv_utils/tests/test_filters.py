@@ -0,0 +1,91 @@
+"""Tests of export filters in src/filters.py."""
+
+import json
+import pytest
+import csv_driver
+from src import filters
+from src import synthetic
+
+FILTERS = [
+    {"issue_num": [5, 12]},
+    {"issue_num": [None, 3], "is_pr": False},
+    {"is_pr": True, "state": "closed"},
+    {"state": ["closed", "merged"]},
+    {"created_at": ["2021-03-01", "2021-09-01"]},
+    {"closed_at": [None, "2022-06-01"]},
+]
+
+
+@pytest.fixture(name="in_path")
+def fixture_in_path(tmp_path) -> str:
+    in_path = str(tmp_path / "in.json")
+    synthetic.write_synthetic_jsonfile(in_path, 40, seed=5, patch_lines=3)
+
+    return in_path
+
+
+def matches(num: str, data: dict, name: str, arg) -> bool:
+    if name == "issue_num":
+        low, high = arg
+        return (low is None or low <= int(num)) and (
+            high is None or int(num) <= high
+        )
+
+    if name == "is_pr":
+        return data["is_pr"] is arg
+
+    if name == "state":
+        return data.get("state") in ([arg] if isinstance(arg, str) else arg)
+
+    start, end = arg
+    date = data[name]
+
+    return bool(date) and (
+        (start is None or start <= date) and (end is None or date < end)
+    )
+
+
+@pytest.mark.parametrize("cfg_filters", FILTERS)
+def test_get_input_issues_applies_filters(in_path, cfg_filters):
+    with open(in_path, encoding="UTF-8") as in_file:
+        issues = json.load(in_file)
+
+    expected = [
+        (num, data)
+        for num, data in issues.items()
+        if all(
+            matches(num, data, name, arg) for name, arg in cfg_filters.items()
+        )
+    ]
+
+    cfg = {"input_json": in_path, "filters": cfg_filters}
+
+    assert list(csv_driver.get_input_issues(cfg)) == expected
+
+
+def test_unreadable_dates_are_skipped(tmp_path, capsys):
+    in_path = tmp_path / "in.json"
+    issues = {
+        "1": {"created_at": "2021-05-01T10:00:00Z"},
+        "2": {"created_at": "not a date"},
+        "3": {"created_at": None},
+    }
+
+    with open(in_path, "w", encoding="UTF-8") as in_file:
+        json.dump(issues, in_file)
+
+    cfg = {
+        "input_json": str(in_path),
+        "filters": {"created_at": ["2021-01-01", None]},
+    }
+
+    assert list(csv_driver.get_input_issues(cfg)) == [("1", issues["1"])]
+    assert 'unreadable created_at "not a date"' in capsys.readouterr().err
+
+
+def test_compile_filters_rejects_bad_filters():
+    with pytest.raises(ValueError):
+        filters.compile_filters({"is_pr": "true"})
+
+    with pytest.raises(ValueError):
+        filters.compile_filters({"labels": ["bug"]})
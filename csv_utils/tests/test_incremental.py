@@ -0,0 +1,95 @@
+"""Tests that incremental exports match full re-exports."""
+
+import copy
+import json
+import pytest
+import csv_driver
+from src import synthetic
+
+OUTPUT_TYPES = ("merged_closed_pulls", "merged_closed_commits")
+
+
+def export(tmp_path, issues: dict, incremental: bool, explode=None) -> list:
+    """Export issues to every output type and return the output bytes."""
+    in_path = tmp_path / "in.json"
+    name = "incremental" if incremental else "full"
+
+    with open(in_path, "w", encoding="UTF-8") as in_file:
+        json.dump(issues, in_file, ensure_ascii=False)
+
+    outputs = [
+        {
+            "output_type": output_type,
+            "output_csv": str(tmp_path / f"{name}_{output_type}.csv"),
+        }
+        for output_type in OUTPUT_TYPES
+    ]
+
+    csv_driver.convert(
+        {
+            "input_json": str(in_path),
+            "outputs": outputs,
+            "delimiter": ",",
+            "separator": "=||=",
+            "incremental": incremental,
+            "explode": explode,
+        }
+    )
+
+    out_data: list = []
+
+    for output in outputs:
+        with open(output["output_csv"], "rb") as out_file:
+            out_data.append(out_file.read())
+
+    return out_data
+
+
+def make_versions() -> list:
+    """Make successive versions of an input, one per kind of change."""
+    base = dict(synthetic.generate_issues(20, seed=3, patch_lines=3))
+    versions = [("create", base)]
+
+    appended = copy.deepcopy(base)
+    appended.update(synthetic.generate_issues(25, seed=3, patch_lines=3))
+    versions.append(("append", appended))
+
+    changed = copy.deepcopy(appended)
+    changed["10"]["title"] = "changed title, with a comma"
+    versions.append(("rewrite", changed))
+
+    versions.append(("unchanged", changed))
+
+    truncated = {key: changed[key] for key in list(changed)[:18]}
+    versions.append(("truncate", truncated))
+
+    removed = {key: val for key, val in truncated.items() if key != "5"}
+    versions.append(("remove", removed))
+
+    reordered = dict(reversed(list(removed.items())))
+    versions.append(("reorder", reordered))
+
+    return versions
+
+
+@pytest.mark.parametrize("explode", [None, "commits", "files"])
+def test_incremental_matches_full_export(tmp_path, capsys, explode):
+    for change, issues in make_versions():
+        capsys.readouterr()
+        incremental = export(tmp_path, issues, True, explode)
+        log = capsys.readouterr().out
+
+        assert incremental == export(tmp_path, issues, False, explode), change
+
+        if change == "unchanged":
+            assert log.count(": 0 rows encoded") == len(OUTPUT_TYPES)
+
+
+def test_incremental_discards_exports_with_other_settings(tmp_path):
+    issues = dict(synthetic.generate_issues(10, seed=4, patch_lines=3))
+
+    export(tmp_path, issues, True)
+
+    assert export(tmp_path, issues, True, "files") == export(
+        tmp_path, issues, False, "files"
+    )
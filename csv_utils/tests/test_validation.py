@@ -0,0 +1,103 @@
+"""Tests of validation of extractor records in src/validation.py."""
+
+import json
+import pytest
+import csv_driver
+from src import synthetic
+
+OUTPUT_TYPES = ("merged_closed_pulls", "merged_closed_commits")
+
+
+def make_issues() -> tuple:
+    """
+    Make issues that are each invalid for some of the outputs only.
+
+    Returns:
+        tuple: the issues, and the output types each invalid issue is left
+        out of
+    """
+    issues = dict(synthetic.generate_issues(12, seed=6, patch_lines=3))
+    prs = [num for num, data in issues.items() if data["is_pr"]]
+    non_prs = [num for num, data in issues.items() if not data["is_pr"]]
+
+    # read by merged_closed_pulls only
+    del issues[non_prs[0]]["title"]
+    issues[prs[0]]["userid"] = "not an id"
+
+    # read by both outputs
+    issues[prs[1]]["state"] = None
+
+    left_out = {
+        non_prs[0]: ["merged_closed_pulls"],
+        prs[0]: ["merged_closed_pulls"],
+        prs[1]: list(OUTPUT_TYPES),
+    }
+
+    return issues, left_out
+
+
+def export(tmp_path, issues: dict, output_types, **options) -> list:
+    """Export issues with validation and return the output bytes."""
+    tmp_path.mkdir(exist_ok=True)
+    in_path = tmp_path / "in.json"
+
+    with open(in_path, "w", encoding="UTF-8") as in_file:
+        json.dump(issues, in_file)
+
+    outputs = [
+        {
+            "output_type": output_type,
+            "output_csv": str(tmp_path / f"{output_type}.csv"),
+        }
+        for output_type in output_types
+    ]
+
+    csv_driver.convert(
+        {
+            "input_json": str(in_path),
+            "outputs": outputs,
+            "delimiter": ",",
+            "separator": "=||=",
+            "validate": True,
+            "quarantine_path": str(tmp_path / "quarantine.jsonl"),
+            **options,
+        }
+    )
+
+    out_data: list = []
+
+    for output in outputs:
+        with open(output["output_csv"], "rb") as out_file:
+            out_data.append(out_file.read())
+
+    return out_data
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"workers": 2, "chunk_size": 3}, {"incremental": True}],
+)
+def test_outputs_only_drop_issues_invalid_for_them(tmp_path, options):
+    issues, _ = make_issues()
+    separate = [
+        export(tmp_path / output_type, issues, [output_type], **options)[0]
+        for output_type in OUTPUT_TYPES
+    ]
+
+    assert export(tmp_path, issues, OUTPUT_TYPES, **options) == separate
+
+
+def test_quarantine_lists_outputs_left_out_of(tmp_path):
+    issues, left_out = make_issues()
+    export(tmp_path, issues, OUTPUT_TYPES)
+
+    with open(tmp_path / "quarantine.jsonl", encoding="UTF-8") as in_file:
+        quarantined = [json.loads(line) for line in in_file]
+
+    assert {entry["issue_num"]: entry["outputs"] for entry in quarantined} == {
+        num: [str(tmp_path / f"{output_type}.csv") for output_type in types]
+        for num, types in left_out.items()
+    }
+    assert all(
+        entry["data"] == issues[entry["issue_num"]] for entry in quarantined
+    )
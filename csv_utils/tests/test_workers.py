@@ -0,0 +1,65 @@
+"""Tests that exports with several workers match single-process exports."""
+
+import pytest
+import csv_driver
+from src import synthetic
+
+OUTPUT_TYPES = ("merged_closed_pulls", "merged_closed_commits")
+
+
+def export(tmp_path, in_path: str, workers: int, **options) -> list:
+    """Export to every output type and return the output bytes."""
+    out_dir = tmp_path / f"workers_{workers}"
+    out_dir.mkdir()
+
+    outputs = [
+        {
+            "output_type": output_type,
+            "output_csv": str(out_dir / f"{output_type}.csv"),
+        }
+        for output_type in OUTPUT_TYPES
+    ]
+
+    csv_driver.convert(
+        {
+            "input_json": in_path,
+            "outputs": outputs,
+            "delimiter": ",",
+            "separator": "=||=",
+            "workers": workers,
+            **options,
+        }
+    )
+
+    out_data: list = []
+
+    for output in outputs:
+        for suffix in ("", ".blobs"):
+            try:
+                with open(output["output_csv"] + suffix, "rb") as out_file:
+                    out_data.append(out_file.read())
+
+            except FileNotFoundError:
+                pass
+
+    return out_data
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"chunk_size": 1},
+        {"chunk_size": 7, "explode": "commits"},
+        {"chunk_size": 7, "explode": "files"},
+        {"chunk_size": 5, "spill_threshold": 50},
+        {"chunk_size": 5, "validate": True},
+    ],
+)
+def test_workers_output_is_identical(tmp_path, options):
+    in_path = str(tmp_path / "in.json")
+    synthetic.write_synthetic_jsonfile(in_path, 60, seed=7, patch_lines=5)
+
+    expected = export(tmp_path, in_path, 1, **options)
+
+    assert export(tmp_path, in_path, 3, **options) == expected
@@ -11,8 +11,11 @@ def main():
 
     cursor = postgres_utils.PGCursor(cfg)
 
-    cursor.update_keys_per_issue()
-    cursor.update_keys_per_period()
+    if cfg.get("bulk_load", False):
+        cursor.bulk_update_keys()
+
+    else:
+        cursor.update_keys()
 
     cursor.write_changes_to_database()
 
@@ -5,9 +5,16 @@ Documentation:
     https://www.psycopg.org/docs/
 """
 
+from decimal import Decimal
+from io import StringIO
+import itertools
 import psycopg2
+import psycopg2.extras
 from src.utils import file_io_utils as file_io
 
+# number of queued row updates sent to the server per round trip
+DEFAULT_PAGE_SIZE = 1000
+
 
 class PGCursor:
     """TODO."""
@@ -31,12 +38,23 @@ class PGCursor:
 
         self.cursor = self.connection.cursor()
 
+        # row updates are queued as (columns, parameters) and sent in
+        # pages; see flush_updates
+        self.page_size: int = cfg.get("page_size", DEFAULT_PAGE_SIZE)
+        self.pending_updates: list = []
+
+        # {tuple of columns: name of the prepared UPDATE statement}
+        self.prepared: dict = {}
+
         self.metrics_dict = file_io.read_jsonfile_into_dict(
-            self.cfg["metrics_input"]
+            self.cfg["metrics_input"],
+            cache_dir=self.cfg.get("json_cache_dir"),
+            cache_max_bytes=self.cfg.get("json_cache_max_bytes"),
         )
 
     def write_changes_to_database(self) -> None:
         """Write changes made to database."""
+        self.flush_updates()
         self.connection.commit()
 
     def close_database_connection(self) -> None:
@@ -46,6 +64,146 @@ class PGCursor:
 
     def update_keys_per_issue(self) -> None:
         """TODO."""
+        for key, cur_metrics in self.__iter_per_issue():
+            self.__update_keys(key, cur_metrics)
+
+    def update_keys_per_period(self) -> None:
+        """TODO."""
+        for key, cur_metrics in self.__iter_per_period():
+            self.__update_keys(key, cur_metrics)
+
+    def update_keys(self) -> None:
+        """
+        Apply all per-issue and per-period metrics, one update per row.
+
+        See plan_key_updates.
+        """
+        for key, cols in self.__get_plan().items():
+            # keys with the same columns share a prepared statement
+            self.__update_keys(key, dict(sorted(cols.items())))
+
+    def plan_key_updates(self) -> dict:
+        """
+        Merge per-issue and per-period metrics into one set per key.
+
+        Conflicting values of a metric are resolved as if every section
+        were written in order, with the last write winning: per-period
+        metrics override per-issue metrics, and later periods override
+        earlier ones, in the order of the metrics input. The number of
+        overridden values is reported.
+
+        Returns:
+            dict: {key: {column name: value}} of every key with metrics
+        """
+        plan: dict = {}
+        num_conflicts = 0
+
+        for key, cur_metrics in itertools.chain(
+            self.__iter_per_issue(), self.__iter_per_period()
+        ):
+            cols: dict = plan.setdefault(str(key), {})
+
+            for col, val in cur_metrics.items():
+                if col in cols and cols[col] != val:
+                    num_conflicts += 1
+
+                cols[col] = val
+
+        if num_conflicts:
+            print(
+                f"{num_conflicts} metric values were overridden by later"
+                " per-period metrics"
+            )
+
+        return {key: cols for key, cols in plan.items() if cols}
+
+    def __get_plan(self) -> dict:
+        plan: dict = self.plan_key_updates()
+
+        if self.cfg.get("delta", False):
+            plan = self.drop_unchanged_updates(plan)
+
+        return plan
+
+    def drop_unchanged_updates(self, plan: dict) -> dict:
+        """
+        Drop planned updates that would not change the table.
+
+        The current values of every planned column are read back for all
+        planned keys in one query. Rows whose planned values all equal the
+        current ones, and keys without a row, are dropped; other rows are
+        kept whole. Values of different types, e.g. a number planned for a
+        text column, count as changed. The number of skipped writes is
+        reported.
+
+        Args:
+            plan (dict): {key: {column name: value}}; see plan_key_updates
+
+        Returns:
+            dict: the updates of plan that change the table
+        """
+        if not plan:
+            return plan
+
+        table = self.cfg["table"]
+        cols: list = sorted({col for row in plan.values() for col in row})
+
+        # the keys are sent as an untyped array literal, which the server
+        # reads as an array of the type of pr. Casting pr instead would
+        # keep the query from using an index on it
+        self.cursor.execute(
+            f"SELECT pr, {', '.join(cols)} FROM {table}"
+            " WHERE project = 'jabref50' AND pr = ANY(%s);",
+            (_to_array_literal(plan),),
+        )
+
+        current: dict = {
+            str(row[0]): dict(zip(cols, row[1:]))
+            for row in self.cursor.fetchall()
+        }
+
+        changed: dict = {}
+        num_missing = 0
+
+        for key, row in plan.items():
+            current_row = current.get(key)
+
+            if current_row is None:
+                num_missing += 1
+
+            elif any(
+                not _is_same_value(current_row[col], val)
+                for col, val in row.items()
+            ):
+                changed[key] = row
+
+        print(
+            f"Delta: {len(plan) - len(changed) - num_missing} of"
+            f" {len(plan)} row writes skipped as unchanged, {num_missing}"
+            " skipped for lack of a row"
+        )
+
+        return changed
+
+    def bulk_update_keys(self) -> None:
+        """
+        Apply all per-issue and per-period metrics in a few statements.
+
+        The metrics of every key are merged by plan_key_updates. Keys are
+        grouped by the set of columns they update. Each group is streamed
+        into a temporary staging table with COPY and applied to the table
+        by a single joined UPDATE, so the number of round trips no longer
+        grows with the number of keys.
+        """
+        groups: dict = {}
+
+        for key, cols in self.__get_plan().items():
+            groups.setdefault(tuple(sorted(cols)), []).append((key, cols))
+
+        for cols, group_rows in groups.items():
+            self.__bulk_update(list(cols), group_rows)
+
+    def __iter_per_issue(self):
         metrics: dict = self.metrics_dict["per_issue"]
         keys: list = list(metrics.keys())
 
@@ -59,27 +217,161 @@ class PGCursor:
                 print(f"ERROR: Key {key} cannot be accessed: {err}")
 
             else:
-                self.__update_keys(key, cur_metrics)
+                yield key, cur_metrics
 
-    def update_keys_per_period(self) -> None:
-        """TODO."""
+    def __iter_per_period(self):
         metrics: dict = self.metrics_dict["per_period"]
 
         for _, period_data in metrics.items():
-            cur_metrics: dict = period_data.copy()
-            del cur_metrics["keys"]
+            cur_metrics: dict = {
+                col: val for col, val in period_data.items() if col != "keys"
+            }
 
             for key in period_data["keys"]:
-                self.__update_keys(key, cur_metrics)
+                yield key, cur_metrics
+
+    def __bulk_update(self, cols: list, rows: list) -> None:
+        table = self.cfg["table"]
+        # temporary tables cannot be created in the schema of the table
+        staging = table.rsplit(".", 1)[-1] + "_staging"
+        col_list: str = ", ".join(cols)
+
+        # the staging table takes the column types of the target table, so
+        # COPY parses values as an UPDATE of the table would
+        self.cursor.execute(
+            f"CREATE TEMP TABLE {staging} AS"
+            f" SELECT pr, {col_list} FROM {table} WITH NO DATA;"
+        )
+
+        copy_data = StringIO()
+
+        for key, row_metrics in rows:
+            copy_data.write(
+                "\t".join(
+                    [_to_copy_text(key)]
+                    + [_to_copy_text(row_metrics[col]) for col in cols]
+                )
+                + "\n"
+            )
+
+        copy_data.seek(0)
+
+        self.cursor.copy_expert(
+            f"COPY {staging} (pr, {col_list}) FROM STDIN", copy_data
+        )
+
+        assignments: str = ", ".join(f"{col} = staged.{col}" for col in cols)
+
+        self.cursor.execute(
+            f"UPDATE {table} SET {assignments} FROM {staging} AS staged"
+            f" WHERE {table}.pr = staged.pr AND {table}.project = 'jabref50';"
+        )
+
+        self.cursor.execute(f"DROP TABLE {staging};")
 
     def __update_keys(self, key, metrics: dict):
-        for metric_key, metric_val in metrics.items():
-            self.update(metric_key, metric_val, str(key))
+        # every metric of a key is set by one statement, so the row is
+        # rewritten once instead of once per metric
+        if metrics:
+            self.update_row(metrics, str(key))
 
     def update(self, col: str, val: str, item_num: str):
         """Update a row in the desired database and table."""
-        table = self.cfg["table"]
+        self.update_row({col: val}, item_num)
+
+    def update_row(self, cols: dict, item_num: str):
+        """
+        Queue an update of several columns of a row in one statement.
+
+        Queued updates are sent once a page of them is full and before
+        changes are committed.
+
+        Args:
+            cols (dict): {column name: value} to set
+            item_num (str): number of the PR whose row is updated
+        """
+        self.pending_updates.append((tuple(cols), [*cols.values(), item_num]))
+
+        if len(self.pending_updates) >= self.page_size:
+            self.flush_updates()
+
+    def flush_updates(self) -> None:
+        """
+        Send all queued row updates, in the order they were queued.
+
+        Each distinct set of columns is updated by its own server-side
+        prepared statement, which is parsed and planned once per session.
+        Values are sent as parameters of the statement, and consecutive
+        updates of the same columns are sent together with execute_batch.
+        """
+        for cols, updates in itertools.groupby(
+            self.pending_updates, key=lambda update: update[0]
+        ):
+            placeholders: str = ", ".join(["%s"] * (len(cols) + 1))
+
+            psycopg2.extras.execute_batch(
+                self.cursor,
+                f"EXECUTE {self.__prepare_update(cols)} ({placeholders})",
+                [params for _, params in updates],
+                page_size=self.page_size,
+            )
+
+        self.pending_updates = []
+
+    def __prepare_update(self, cols: tuple) -> str:
+        name = self.prepared.get(cols)
+
+        if name is None:
+            name = f"update_metrics_{len(self.prepared)}"
+            table = self.cfg["table"]
+
+            assignments: str = ", ".join(
+                f"{col} = ${i}" for i, col in enumerate(cols, 1)
+            )
+
+            # parameter types are inferred from the columns
+            self.cursor.execute(
+                f"PREPARE {name} AS UPDATE {table} SET {assignments}"
+                f" WHERE pr = ${len(cols) + 1} AND project = 'jabref50';"
+            )
+
+            self.prepared[cols] = name
+
+        return name
+
+
+def _to_copy_text(val) -> str:
+    # value in the text format of COPY
+    if val is None:
+        return "\\N"
+
+    return (
+        str(val)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _to_array_literal(vals) -> str:
+    # text form of an array, with every element quoted
+    elements = (
+        str(val).replace("\\", "\\\\").replace('"', '\\"') for val in vals
+    )
+
+    return "{" + ",".join(f'"{element}"' for element in elements) + "}"
+
+
+def _is_same_value(current, val) -> bool:
+    if isinstance(current, bool) or isinstance(val, bool):
+        return current is val
+
+    # numeric columns are read back as Decimal, float, or int
+    if isinstance(val, (int, float)):
+        if isinstance(current, Decimal):
+            return current == Decimal(str(val))
 
-        update_query: str = f"UPDATE {table} SET {col} = {val} WHERE pr = '{item_num}' AND project = 'jabref50';"
+        return isinstance(current, (int, float)) and current == val
 
-        self.cursor.execute(update_query)
+    return type(current) is type(val) and current == val
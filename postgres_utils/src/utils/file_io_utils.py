@@ -3,15 +3,51 @@ Utilites for reading from and writing to files.
 
 json docs:
     https://docs.python.org/3/library/json.html
+
+zstandard docs:
+    https://python-zstandard.readthedocs.io/en/latest/
+
+orjson docs:
+    https://github.com/ijl/orjson
 """
 
+import gzip
+import hashlib
 import json
 from json.decoder import JSONDecodeError
 import os
+import pickle
 import sys
 
+try:
+    import zstandard
+
+except ImportError:
+    zstandard = None
+
+try:
+    import orjson
+
+except ImportError:
+    orjson = None
+
 from src.utils import dict_utils
 
+# parsed JSON cache; see read_jsonfile_into_dict
+JSON_CACHE_INDEX = "index.json"
+JSON_CACHE_MAX_BYTES = 4 << 30
+JSON_CACHE_SUFFIX = f".p{pickle.HIGHEST_PROTOCOL}.pickle"
+
+# serializers of write_dict_to_jsonfile
+JSON_SERIALIZERS = ("indent", "compact", "orjson")
+
+# journal of merges into a JSON file; see write_merged_dict_to_jsonfile.
+# The journal is compacted into the file once it is larger than the file
+# times JOURNAL_COMPACT_RATIO and at least JOURNAL_MIN_COMPACT_BYTES
+JOURNAL_SUFFIX = ".journal.jsonl"
+JOURNAL_COMPACT_RATIO = 1.0
+JOURNAL_MIN_COMPACT_BYTES = 1 << 20
+
 
 def mk_json_outpath(out_path: str):
     """
@@ -50,6 +86,50 @@ def mk_json_outpath(out_path: str):
         pass
 
 
+def open_text_file(path: str, mode: str = "r", newline=None):
+    """
+    Open a text file, compressing or decompressing it by its extension.
+
+    Files ending in ".gz" are opened with gzip and files ending in ".zst"
+    with zstandard. Both stream, so compressed files never have to be
+    held in memory or on disk uncompressed. All other files are opened as
+    plain text.
+
+    Args:
+        path (str): path to file to open.
+        mode (str): "r", "w", "x", or "a".
+        newline (str | None): newline handling, as for open().
+
+    Raises:
+        ImportError: hard exit if a ".zst" file is opened without
+        zstandard installed.
+
+    Returns:
+        TextIO: file object of the file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".gz":
+        return gzip.open(
+            path,
+            mode + "t",
+            compresslevel=6,
+            encoding="UTF-8",
+            newline=newline,
+        )
+
+    if extension == ".zst":
+        if zstandard is None:
+            print(f'\nReading or writing "{path}" requires zstandard!')
+            sys.exit(1)
+
+        return zstandard.open(
+            path, mode + "t", encoding="UTF-8", newline=newline
+        )
+
+    return open(path, mode, encoding="UTF-8", newline=newline)
+
+
 def _read_json_into_text(in_path: str) -> str:
     """
     Read file contents into string.
@@ -66,7 +146,7 @@ def _read_json_into_text(in_path: str) -> str:
         str: text from file.
     """
     try:
-        with open(in_path, "r", encoding="UTF-8") as file_obj:
+        with open_text_file(in_path, "r") as file_obj:
             json_text = file_obj.read()
 
     except FileNotFoundError:
@@ -104,23 +184,172 @@ def read_file_line(in_path: str) -> str:
         return file_text.strip().strip("\n")
 
 
-def read_jsonfile_into_dict(in_path: str) -> dict:
+def read_jsonfile_into_dict(
+    in_path: str, cache_dir=None, cache_max_bytes=None
+) -> dict:
     """
     Read the contents of the provided JSON file into a dictionary.
 
+    If a cache directory is given, the parsed contents are pickled there
+    and later reads of the same, unchanged file load them instead of
+    parsing the JSON again. Cache entries are shared by every caller that
+    uses the same cache directory.
+
+    If the file has a merge journal, the journal is replayed over the
+    contents; see write_merged_dict_to_jsonfile.
+
+    Args:
+        in_path (str): path to JSON file to read from.
+        cache_dir (str | None): directory of the parsed JSON cache. Caching
+            is disabled if None.
+        cache_max_bytes (int | None): size bound of the cache directory.
+            Defaults to JSON_CACHE_MAX_BYTES.
+
+    Returns:
+        dict: dictionary constructed from JSON contents.
+    """
+    journal_path = in_path + JOURNAL_SUFFIX
+
+    if not os.path.exists(journal_path):
+        journal_path = None
+
+    if journal_path is not None and not os.path.exists(in_path):
+        # every merge so far is still in the journal
+        json_dict = {}
+
+    elif cache_dir is not None:
+        json_dict = _read_cached_jsonfile(
+            in_path, cache_dir, cache_max_bytes or JSON_CACHE_MAX_BYTES
+        )
+
+    else:
+        json_text = _read_json_into_text(in_path)
+
+        json_dict = read_jsontext_into_dict(json_text)
+
+    if journal_path is not None:
+        _replay_journal(json_dict, journal_path)
+
+    return json_dict
+
+
+def _read_cached_jsonfile(
+    in_path: str, cache_dir: str, cache_max_bytes: int
+) -> dict:
+    """
+    Read a JSON file through the parsed JSON cache.
+
+    Entries are named by a hash of the file's contents, so a file that is
+    copied or touched without changing still hits the cache. To avoid
+    hashing the file on every read, an index maps each file's path, size,
+    and modification time to the content hash last seen for it. The least
+    recently used entries are evicted once the entries take up more than
+    cache_max_bytes. Entries are pickles, so the cache directory must only
+    be writable by trusted users.
+
     Args:
         in_path (str): path to JSON file to read from.
+        cache_dir (str): directory of the parsed JSON cache.
+        cache_max_bytes (int): size bound of the cache directory.
+
+    Raises:
+        FileNotFoundError: hard exit if a file cannot be found.
 
     Returns:
         dict: dictionary constructed from JSON contents.
     """
-    json_text = _read_json_into_text(in_path)
+    try:
+        stat = os.stat(in_path)
+
+    except FileNotFoundError:
+        print(f'\nFile at "{in_path}" not found!')
+        sys.exit(1)
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    index_path = os.path.join(cache_dir, JSON_CACHE_INDEX)
+    index: dict = {}
+
+    if os.path.exists(index_path):
+        index = read_jsonfile_into_dict(index_path)
+
+    stat_key = f"{os.path.abspath(in_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    content_hash = index.get(stat_key) or _hash_file(in_path)
+    entry_path = os.path.join(cache_dir, content_hash + JSON_CACHE_SUFFIX)
+
+    try:
+        with open(entry_path, "rb") as entry_file:
+            json_dict = pickle.load(entry_file)
+
+        # mark entry as recently used
+        os.utime(entry_path)
+
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        json_dict = read_jsontext_into_dict(_read_json_into_text(in_path))
+
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, "wb") as entry_file:
+            pickle.dump(
+                json_dict, entry_file, protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+        os.replace(tmp_path, entry_path)
+
+        _evict_json_cache(cache_dir, cache_max_bytes, keep=entry_path)
+
+    if index.get(stat_key) != content_hash:
+        index[stat_key] = content_hash
+
+        # drop index entries of evicted cache entries
+        index = {
+            key: val
+            for key, val in index.items()
+            if os.path.exists(os.path.join(cache_dir, val + JSON_CACHE_SUFFIX))
+        }
+
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
 
-    json_dict = read_jsontext_into_dict(json_text)
+        with open(tmp_path, "w", encoding="UTF-8") as index_file:
+            json.dump(index, index_file, ensure_ascii=False)
+
+        os.replace(tmp_path, index_path)
 
     return json_dict
 
 
+def _hash_file(in_path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+
+    with open(in_path, "rb") as file_obj:
+        while data := file_obj.read(1 << 20):
+            digest.update(data)
+
+    return digest.hexdigest()
+
+
+def _evict_json_cache(cache_dir: str, cache_max_bytes: int, keep: str):
+    entries = [
+        entry
+        for entry in os.scandir(cache_dir)
+        if entry.name.endswith(JSON_CACHE_SUFFIX) and entry.path != keep
+    ]
+
+    total_bytes = os.path.getsize(keep) + sum(
+        entry.stat().st_size for entry in entries
+    )
+
+    # least recently used first
+    entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+
+    for entry in entries:
+        if total_bytes <= cache_max_bytes:
+            break
+
+        total_bytes -= entry.stat().st_size
+        os.remove(entry.path)
+
+
 def read_jsontext_into_dict(json_text: str) -> dict:
     """
     Convert text from JSON file into a python dict.
@@ -146,29 +375,97 @@ def read_jsontext_into_dict(json_text: str) -> dict:
         return json_dict
 
 
-def write_dict_to_jsonfile(out_dict: dict, out_path: str) -> None:
+def write_dict_to_jsonfile(
+    out_dict: dict, out_path: str, serializer: str = "indent"
+) -> None:
     """
     Write given Python dictionary to output file as JSON.
 
+    The JSON is written to a temporary file next to the output, synced to
+    disk, and renamed over the output, so a crash mid-write leaves either
+    the old or the new file in place but never a truncated one.
+
     Args:
         out_dict (dict): dictionary to write as JSON.
         out_path (str): path to write output to.
+        serializer (str): one of JSON_SERIALIZERS. "indent" writes with an
+            indentation of 4, "compact" without any whitespace, and
+            "orjson" like "compact" but using the much faster orjson.
 
     Raises:
         FileNotFoundError: no file found at given path.
+        ValueError: if the serializer is not known.
     """
-    mk_json_outpath(out_path)
+    json_text = _serialize_json(out_dict, serializer)
+
+    out_dir = os.path.dirname(out_path)
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    # keep the extension so that the temporary file is compressed alike
+    root, extension = os.path.splitext(out_path)
+    tmp_path = f"{root}.{os.getpid()}.tmp{extension}"
 
     try:
-        with open(out_path, "w", encoding="UTF-8") as json_outfile:
-            json.dump(out_dict, json_outfile, ensure_ascii=False, indent=4)
+        with open_text_file(tmp_path, "w") as json_outfile:
+            json_outfile.write(json_text)
+
+        _fsync_path(tmp_path)
+        os.replace(tmp_path, out_path)
 
     except FileNotFoundError:
         print(f"\nFile at {out_path} not found!")
         sys.exit(1)
 
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # make the rename itself durable
+    if os.name == "posix":
+        _fsync_path(out_dir or ".")
+
 
-def write_merged_dict_to_jsonfile(out_dict: dict, out_path: str) -> None:
+def _serialize_json(out_dict: dict, serializer: str) -> str:
+    if serializer == "indent":
+        return json.dumps(out_dict, ensure_ascii=False, indent=4)
+
+    if serializer == "compact":
+        return json.dumps(out_dict, ensure_ascii=False, separators=(",", ":"))
+
+    if serializer == "orjson":
+        if orjson is None:
+            print("\nThe orjson serializer requires orjson to be installed!")
+            sys.exit(1)
+
+        # int keys are written as strings, as by the json module
+        return orjson.dumps(
+            out_dict, option=orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+
+    raise ValueError(f'Unknown JSON serializer "{serializer}"')
+
+
+def _fsync_path(path: str) -> None:
+    # directories can only be opened read-only; files must be writable to
+    # be synced on some platforms
+    flags = os.O_RDONLY if os.path.isdir(path) else os.O_RDWR
+    fd = os.open(path, flags)
+
+    try:
+        os.fsync(fd)
+
+    finally:
+        os.close(fd)
+
+
+def write_merged_dict_to_jsonfile(
+    out_dict: dict,
+    out_path: str,
+    serializer: str = "indent",
+    journal: bool = False,
+) -> None:
     """
     Recursively merge dictionaries and write them to an output JSON file.
 
@@ -176,17 +473,137 @@ def write_merged_dict_to_jsonfile(out_dict: dict, out_path: str) -> None:
     already be there, and recursively merge in param data from the
     most recent round of API calls.
 
+    In journal mode, the data is instead appended as one line to a JSON
+    Lines journal next to the output, "<out_path>.journal.jsonl", so each
+    merge costs only as much as the new data. read_jsonfile_into_dict
+    replays the journal over the output, and the journal is folded back
+    into the output once it grows too large; see JOURNAL_COMPACT_RATIO and
+    compact_jsonfile_journal. Readers other than read_jsonfile_into_dict
+    only see the output as of the last compaction.
+
     Args:
         out_dict (dict): dict of data from round of API calls
             to merge and write.
         out_path (str): path to output file.
+        serializer (str): see write_dict_to_jsonfile.
+        journal (bool): append to the journal instead of rewriting the
+            output.
     """
-    # attempt to read JSON out of output file. Will return
-    # empty dict if no valid Json is found
+    if journal:
+        journal_path = out_path + JOURNAL_SUFFIX
+        _append_to_journal(out_dict, journal_path)
+
+        out_size = 0
+
+        if os.path.exists(out_path):
+            out_size = os.path.getsize(out_path)
+
+        if os.path.getsize(journal_path) > max(
+            JOURNAL_MIN_COMPACT_BYTES, out_size * JOURNAL_COMPACT_RATIO
+        ):
+            compact_jsonfile_journal(out_path, serializer)
+
+        return
+
+    # fold any journal into the output first. Were the journal still around
+    # after the merge below, a crash before its removal would leave it to
+    # be replayed over, and revert, the newly merged values
+    compact_jsonfile_journal(out_path, serializer)
+
+    # attempt to read JSON out of output file. Will return empty dict if no
+    # valid Json is found
     json_dict = read_jsonfile_into_dict(out_path)
 
     # recursively merge all dicts and nested dicts in both dictionaries
     dict_utils.merge_dicts_recursive(json_dict, out_dict)
 
     # write JSON content back to file
-    write_dict_to_jsonfile(json_dict, out_path)
+    write_dict_to_jsonfile(json_dict, out_path, serializer)
+
+
+def compact_jsonfile_journal(
+    out_path: str, serializer: str = "indent"
+) -> None:
+    """
+    Fold the merge journal of a JSON file into the file.
+
+    The merged file is written atomically before the journal is removed.
+    Should the journal outlive a crash in between, replaying it again
+    yields the same contents, since nothing else has been merged into the
+    file since.
+
+    Args:
+        out_path (str): path to output file.
+        serializer (str): see write_dict_to_jsonfile.
+    """
+    journal_path = out_path + JOURNAL_SUFFIX
+
+    if not os.path.exists(journal_path):
+        return
+
+    json_dict = read_jsonfile_into_dict(out_path)
+    write_dict_to_jsonfile(json_dict, out_path, serializer)
+
+    _remove_journal(journal_path)
+
+
+def _append_to_journal(out_dict: dict, journal_path: str) -> None:
+    line = json.dumps(out_dict, ensure_ascii=False, separators=(",", ":"))
+
+    os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+
+    if os.path.exists(journal_path):
+        _truncate_torn_line(journal_path)
+
+    with open(journal_path, "ab") as journal_file:
+        journal_file.write(line.encode("utf-8") + b"\n")
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+
+def _truncate_torn_line(journal_path: str) -> None:
+    # drop a last line that a crash cut off mid-append, so that the next
+    # line does not run into it
+    with open(journal_path, "r+b") as journal_file:
+        pos = journal_file.seek(0, os.SEEK_END)
+        end = pos
+
+        while pos:
+            block_start = max(0, pos - (1 << 16))
+            journal_file.seek(block_start)
+            block = journal_file.read(pos - block_start)
+            newline = block.rfind(b"\n")
+
+            if newline != -1:
+                pos = block_start + newline + 1
+                break
+
+            pos = block_start
+
+        if pos != end:
+            journal_file.truncate(pos)
+
+
+def _replay_journal(json_dict: dict, journal_path: str) -> None:
+    with open(journal_path, "r", encoding="UTF-8") as journal_file:
+        for line in journal_file:
+            # a line without a newline was cut off by a crash mid-append
+            if not line.endswith("\n"):
+                break
+
+            try:
+                fragment = json.loads(line)
+
+            except JSONDecodeError:
+                print(f'\nJournal at "{journal_path}" is corrupt!')
+                sys.exit(1)
+
+            dict_utils.merge_dicts_recursive(json_dict, fragment)
+
+
+def _remove_journal(journal_path: str) -> None:
+    try:
+        os.remove(journal_path)
+
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,8 @@
+"""Make the modules of postgres_utils importable as they are by main.py."""
+
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
@@ -0,0 +1,136 @@
+"""Tests of the merge journal in src/utils/file_io_utils.py."""
+
+import json
+import os
+import pytest
+from src.utils import file_io_utils as io
+
+# successive rounds of data merged into an output, overriding nested and
+# top-level values and replacing dicts with other values and back
+FRAGMENTS = [
+    {"1": {"a": 1, "b": {"c": 2}}, "2": {"a": "x"}},
+    {"1": {"b": {"d": 3}}, "3": []},
+    {"1": {"a": None}, "2": "flat", "4": {"é": "ü 中文"}},
+    {"2": {"a": "y"}, "3": {"n": [1, 2]}},
+    {"1": {"b": {"c": 5}}},
+]
+
+
+def merge_all(out_path: str, fragments: list, journal: bool) -> None:
+    # plain merges need the output to exist, as for the extractor
+    if not journal:
+        io.mk_json_outpath(out_path)
+
+    for fragment in fragments:
+        io.write_merged_dict_to_jsonfile(fragment, out_path, journal=journal)
+
+
+@pytest.mark.parametrize("min_compact_bytes", [0, 1 << 30])
+def test_journal_merge_matches_plain_merge(
+    tmp_path, monkeypatch, min_compact_bytes
+):
+    # compact after every merge, or never
+    monkeypatch.setattr(io, "JOURNAL_MIN_COMPACT_BYTES", min_compact_bytes)
+    monkeypatch.setattr(io, "JOURNAL_COMPACT_RATIO", 0)
+
+    plain_path = str(tmp_path / "plain.json")
+    journal_path = str(tmp_path / "new_dir" / "journal.json")
+
+    merge_all(plain_path, FRAGMENTS, False)
+    merge_all(journal_path, FRAGMENTS, True)
+
+    expected = io.read_jsonfile_into_dict(plain_path)
+
+    assert io.read_jsonfile_into_dict(journal_path) == expected
+
+    io.compact_jsonfile_journal(journal_path)
+
+    assert not os.path.exists(journal_path + io.JOURNAL_SUFFIX)
+
+    with open(journal_path, encoding="UTF-8") as json_file:
+        assert json.load(json_file) == expected
+
+
+@pytest.mark.parametrize("torn_line", [b'{"1": {"a": "to', b'{"5": 5}'])
+def test_torn_journal_line_is_ignored_then_truncated(tmp_path, torn_line):
+    out_path = str(tmp_path / "out.json")
+    journal_path = out_path + io.JOURNAL_SUFFIX
+
+    merge_all(out_path, FRAGMENTS[:2], True)
+    expected = io.read_jsonfile_into_dict(out_path)
+
+    with open(journal_path, "rb") as journal_file:
+        journal = journal_file.read()
+
+    # a crash cut off the last append
+    with open(journal_path, "ab") as journal_file:
+        journal_file.write(torn_line)
+
+    assert io.read_jsonfile_into_dict(out_path) == expected
+
+    merge_all(out_path, FRAGMENTS[2:3], True)
+
+    with open(journal_path, "rb") as journal_file:
+        assert journal_file.read() == journal + (
+            json.dumps(
+                FRAGMENTS[2], ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+            + b"\n"
+        )
+
+    plain_path = str(tmp_path / "plain.json")
+    merge_all(plain_path, FRAGMENTS[:3], False)
+
+    assert io.read_jsonfile_into_dict(out_path) == (
+        io.read_jsonfile_into_dict(plain_path)
+    )
+
+
+def test_torn_line_longer_than_a_read_block(tmp_path):
+    out_path = str(tmp_path / "out.json")
+    journal_path = out_path + io.JOURNAL_SUFFIX
+
+    merge_all(out_path, FRAGMENTS[:1], True)
+
+    with open(journal_path, "ab") as journal_file:
+        journal_file.write(b'{"2": "' + b"x" * (1 << 17))
+
+    merge_all(out_path, FRAGMENTS[1:2], True)
+
+    with open(journal_path, "rb") as journal_file:
+        assert [json.loads(line) for line in journal_file] == FRAGMENTS[:2]
+
+
+def test_plain_merge_folds_in_pending_journal(tmp_path):
+    out_path = str(tmp_path / "out.json")
+    journal_path = out_path + io.JOURNAL_SUFFIX
+
+    merge_all(out_path, FRAGMENTS[:1], False)
+    merge_all(out_path, FRAGMENTS[1:3], True)
+    merge_all(out_path, FRAGMENTS[3:], False)
+
+    assert not os.path.exists(journal_path)
+
+    plain_path = str(tmp_path / "plain.json")
+    merge_all(plain_path, FRAGMENTS, False)
+
+    with open(out_path, encoding="UTF-8") as json_file:
+        assert json.load(json_file) == io.read_jsonfile_into_dict(plain_path)
+
+
+def test_plain_merge_is_not_reverted_by_stale_journal(tmp_path, monkeypatch):
+    out_path = str(tmp_path / "out.json")
+    journal_path = out_path + io.JOURNAL_SUFFIX
+
+    merge_all(out_path, [{"1": {"a": "old"}}], True)
+
+    # a crash after the journal was folded in but before it was removed
+    monkeypatch.setattr(io, "_remove_journal", lambda journal_path: None)
+    io.compact_jsonfile_journal(out_path)
+    monkeypatch.undo()
+
+    assert os.path.exists(journal_path)
+
+    merge_all(out_path, [{"1": {"a": "new"}}], False)
+
+    assert io.read_jsonfile_into_dict(out_path) == {"1": {"a": "new"}}